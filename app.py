@@ -2,26 +2,18 @@ import os
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, Integer, String, Date, Enum, Numeric, ForeignKey, DateTime
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from dotenv import load_dotenv
+from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import date
 from datetime import datetime
 from sqlalchemy.orm import aliased
 from globals import arbitrage_sides_lookup
 import uvicorn
-from sqlalchemy import Float
-
-# Load environment variables from .env
-load_dotenv()
+from models import SessionLocal, get_engine, create_tables
+from models import BetDescription, ArbitrageOpportunities, SimilarEventOptions, SimilarEvents, BetSides, Price
 
 # Database Setup
-DATABASE_URL = f"mysql+mysqlconnector://{os.getenv('DB_USER')}:{os.getenv('DB_PASS')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+engine = get_engine()
 
 # Initialize FastAPI app
 app = FastAPI()
@@ -37,62 +29,8 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
-# SQLAlchemy Models
-class BetDescription(Base):
-    __tablename__ = "bet_description"
-    bet_id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
-    expiration_date = Column(Date, nullable=True)
-    website = Column(String, nullable=True)
-    bet_url = Column(String, nullable=True)  # New field for bet URL
-    status = Column(Enum("open", "closed", name="status_enum"), nullable=True)
-    is_arbitrage = Column(Enum("yes", "no", name="arbitrage_enum"), nullable=True)
-
-class ArbitrageOpportunities(Base):
-    __tablename__ = "arbitrage_opportunities"
-
-    arb_id = Column(Integer, primary_key=True, index=True)
-    bet_id1 = Column(Integer, nullable=False)
-    bet_id2 = Column(Integer, nullable=False)
-    bet_description_1 = Column(String(255), nullable=True)  # Match the database column type
-    bet_description_2 = Column(String(255), nullable=True)
-    website_1 = Column(String(255), nullable=True)
-    website_2 = Column(String(255), nullable=True)
-    option_name_1 = Column(String(255), nullable=True)
-    option_name_2 = Column(String(255), nullable=True)
-    bet_side_1 = Column(String(10), nullable=True)
-    bet_side_2 = Column(String(10), nullable=True)
-    profit = Column(Float, nullable=True)  # Use Float instead of DECIMAL
-    bet_amount_1 = Column(Float, nullable=True)  # Use Float instead of DECIMAL
-    bet_amount_2 = Column(Float, nullable=True)  # Use Float instead of DECIMAL
-    timestamp = Column(DateTime, nullable=True)
-
-class SimilarEventOptions(Base):
-    __tablename__ = 'similar_event_options'
-    event_id = Column(Integer, primary_key=True, index=True)
-    option_id_1 = Column(Integer)
-    option_id_2 = Column(Integer)
-    option_name_1 = Column(String(255))
-    option_name_2 = Column(String(255))
-
-class SimilarEvents(Base):
-    __tablename__ = 'similar_events'
-    event_id = Column(Integer, primary_key=True, index=True)
-    bet_id_1 = Column(Integer)
-    description_1 = Column(String(255))
-    website_1 = Column(String(255))
-    bet_id_2 = Column(Integer)
-    description_2 = Column(String(255))
-    website_2 = Column(String(255))
-
-class BetSides(Base):
-    __tablename__ = 'arbitrage_bet_sides'
-    arb_id = Column(Integer, ForeignKey('arbitrage_opportunities.arb_id'), primary_key=True)
-    bet_side_1 = Column(String(10), nullable=False)
-    bet_side_2 = Column(String(10), nullable=False)
-
 # Create all tables in the database
-Base.metadata.create_all(bind=engine)
+create_tables(engine)
 
 # Pydantic Models (for validation and serialization)
 class BetDescriptionBase(BaseModel):
@@ -321,17 +259,6 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT",8080))
     uvicorn.run("app:app", host="0.0.0.0", port=port, reload=True)
 
-# Additional SQLAlchemy Model for Price Table
-class Price(Base):
-    __tablename__ = 'price'
-    option_id = Column(Integer, ForeignKey('bet_choice.option_id'), primary_key=True, index=True)
-    timestamp = Column(Date, primary_key=True)
-    volume = Column(Numeric, nullable=True)
-    yes_price = Column(Numeric, nullable=True)
-    no_price = Column(Numeric, nullable=True)
-    yes_odds = Column(Numeric, nullable=True)
-    no_odds = Column(Numeric, nullable=True)
-
 # Pydantic Models for Price Table
 class PriceBase(BaseModel):
     option_id: int
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+from storage import Error
+from globals import remove_from_arbitrage_sides_lookup
+
+# Archive for arbitrage opportunities.
+# Opportunities older than ARCHIVE_AFTER, or whose events have closed, are moved to
+# arbitrage_opportunities_archive / arbitrage_bet_sides_archive so the live tables,
+# which the API reads in full, only hold current opportunities.
+# The archive tables are created by a migration (see migrations.py). Rows are copied
+# by the explicit column lists below, so a column added to a live table doesn't break
+# archiving; a migration that adds one should add it to the archive table too, and
+# then to these lists.
+#
+#   python arbitrage_archive.py   run one archive pass
+
+ARCHIVE_AFTER = timedelta(days=7)
+
+# Opportunities moved per transaction
+ARCHIVE_CHUNK_SIZE = 1000
+
+OPPORTUNITY_COLUMNS = (
+    "arb_id", "bet_id1", "bet_id2", "timestamp", "profit",
+    "option_id_1", "option_id_2", "option_name_1", "option_name_2",
+    "bet_description_1", "bet_description_2", "website_1", "website_2",
+    "bet_side_1", "bet_side_2", "price_yes_1", "price_no_2", "bet_amount_1", "bet_amount_2",
+)
+BET_SIDE_COLUMNS = ("arb_id", "bet_side_1", "bet_side_2")
+
+def create_archive_tables(cursor):
+    """
+    Migration step. The archive tables copy the live tables' columns and indexes as
+    they are at that point (LIKE does not copy foreign keys, so archived sides don't
+    depend on archived opportunities).
+    """
+    cursor.execute("CREATE TABLE IF NOT EXISTS arbitrage_opportunities_archive LIKE arbitrage_opportunities")
+    cursor.execute("CREATE TABLE IF NOT EXISTS arbitrage_bet_sides_archive LIKE arbitrage_bet_sides")
+
+def select_stale_ids(cursor, cutoff, limit):
+    """
+    Return up to `limit` arb_ids that are older than cutoff or reference a closed event.
+    """
+    cursor.execute("""
+        SELECT arb_id FROM arbitrage_opportunities WHERE timestamp < %s
+        UNION
+        SELECT ao.arb_id FROM arbitrage_opportunities ao
+        JOIN bet_description bd ON bd.bet_id = ao.bet_id1
+        WHERE bd.status = 'closed'
+        UNION
+        SELECT ao.arb_id FROM arbitrage_opportunities ao
+        JOIN bet_description bd ON bd.bet_id = ao.bet_id2
+        WHERE bd.status = 'closed'
+        LIMIT %s
+    """, (cutoff, limit))
+    return [row[0] for row in cursor.fetchall()]
+
+def archive_arbitrage_opportunities(connection, archive_after=ARCHIVE_AFTER, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """
+    Move stale opportunities and their bet sides into the archive tables, chunk_size
+    opportunities per transaction. Bet sides are copied with their opportunities and
+    deleted before them, as arbitrage_bet_sides references arbitrage_opportunities.
+    Returns the number of opportunities archived.
+    """
+    cutoff = datetime.now() - archive_after
+    archived = 0
+    opportunity_columns = ", ".join(OPPORTUNITY_COLUMNS)
+    bet_side_columns = ", ".join(BET_SIDE_COLUMNS)
+
+    try:
+        with connection.cursor() as cursor:
+            while True:
+                arb_ids = select_stale_ids(cursor, cutoff, chunk_size)
+                if not arb_ids:
+                    break
+
+                placeholders = ", ".join(["%s"] * len(arb_ids))
+                cursor.execute(f"""
+                    INSERT IGNORE INTO arbitrage_opportunities_archive ({opportunity_columns})
+                    SELECT {opportunity_columns} FROM arbitrage_opportunities WHERE arb_id IN ({placeholders})
+                """, arb_ids)
+                cursor.execute(f"""
+                    INSERT IGNORE INTO arbitrage_bet_sides_archive ({bet_side_columns})
+                    SELECT {bet_side_columns} FROM arbitrage_bet_sides WHERE arb_id IN ({placeholders})
+                """, arb_ids)
+                cursor.execute(f"DELETE FROM arbitrage_bet_sides WHERE arb_id IN ({placeholders})", arb_ids)
+                cursor.execute(f"DELETE FROM arbitrage_opportunities WHERE arb_id IN ({placeholders})", arb_ids)
+                connection.commit()
+
+                remove_from_arbitrage_sides_lookup(arb_ids)
+                archived += len(arb_ids)
+                if len(arb_ids) < chunk_size:
+                    break
+    except Error as e:
+        connection.rollback()
+        print(f"Error archiving arbitrage opportunities: {e}")
+
+    if archived:
+        print(f"Archived {archived} arbitrage opportunities.")
+    else:
+        print("No stale arbitrage opportunities found.")
+    return archived
+
+def run_arbitrage_archive():
+    import main
+
+    connection = main.create_connection()
+    if connection is None:
+        print("Failed to connect to the database.")
+        return
+    try:
+        archive_arbitrage_opportunities(connection)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    run_arbitrage_archive()
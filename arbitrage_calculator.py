@@ -4,14 +4,15 @@ from requests.adapters import HTTPAdapter
 from typing import Optional, Tuple
 from requests import Session
 from requests.packages.urllib3.util.retry import Retry
-from app import SessionLocal
-from app import BetDescription, Price  
-import mysql.connector
-from mysql.connector import Error
-import os
-from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, date
+import threading
+import time
 from globals import add_to_arbitrage_sides_lookup
+from market_state import market_state
+from pair_catalog import pair_catalog
+from prepared_statements import fetch_one
+from price_retention import latest_bar
+from storage import create_connection, Error
 
 # API endpoint
 API_BASE_URL = "http://localhost:9000/api/v1/bets"
@@ -21,24 +22,6 @@ session = requests.Session()
 retries = Retry(total=5, backoff_factor=1, status_forcelist=[502, 503, 504])
 session.mount("http://", HTTPAdapter(max_retries=retries))
 
-# Load environment variables
-load_dotenv()
-
-# Establish connection
-def create_connection():
-    connection = None
-    try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASS'),
-            database=os.getenv('DB_NAME')
-        )
-        #print("Successfully connected to the database")
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-    return connection
-
 # Fetch similar option pairs from the database
 def get_similar_option_pairs():
     """
@@ -72,7 +55,7 @@ def get_similar_option_pairs():
             print(f"Fetched similar option pairs: {similar_option_pairs}")
             return similar_option_pairs
     
-    except mysql.connector.Error as e:
+    except Error as e:
         print(f"Error fetching similar option pairs: {e}")
         return []
     
@@ -80,15 +63,145 @@ def get_similar_option_pairs():
         connection.close()
         #print("Database connection closed.")
 
+# Active pairs: similar option pairs whose events are both still open and unexpired
+class ActivePairSet:
+    """
+    In-memory set of the pair catalog entries worth evaluating (see pair_catalog).
+    It is filtered with one query for the open, unexpired bets the catalog refers to,
+    pruned in place when close_past_events closes events, and reloaded when the
+    catalog version changes or after refresh_interval seconds. An option_id -> pairs
+    index is built on demand for evaluating only the pairs a quote update affects.
+    """
+    def __init__(self, refresh_interval=600):
+        self.refresh_interval = refresh_interval
+        self.pairs = None
+        self._by_option = None
+        self._catalog_version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self, connection, catalog):
+        query = """
+        SELECT bet_id, expiration_date
+        FROM bet_description
+        WHERE bet_id IN (
+            SELECT bet_id_1 FROM pair_catalog
+            UNION
+            SELECT bet_id_2 FROM pair_catalog
+        )
+        AND COALESCE(status, 'open') = 'open'
+        AND (expiration_date IS NULL OR expiration_date >= CURDATE())
+        """
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(query)
+                open_bets = dict(cursor.fetchall())
+        except Error as e:
+            print(f"Error fetching open bets for active pairs: {e}")
+            return False
+
+        pairs = []
+        for pair in catalog:
+            if pair["bet_id_1"] in open_bets and pair["bet_id_2"] in open_bets:
+                pairs.append(dict(pair, expiration_1=open_bets[pair["bet_id_1"]], expiration_2=open_bets[pair["bet_id_2"]]))
+
+        with self._lock:
+            self.pairs = pairs
+            self._by_option = None
+            self._catalog_version = pair_catalog.version
+            self._loaded_at = time.monotonic()
+        print(f"Loaded {len(pairs)} active option pairs out of {len(catalog)}.")
+        return True
+
+    def ensure_loaded(self, connection):
+        """
+        Reload if the set is missing, stale or built from an older catalog.
+        Returns False if there is no set to use.
+        """
+        catalog = pair_catalog.get(connection)
+        if (self.pairs is None
+                or self._catalog_version != pair_catalog.version
+                or time.monotonic() - self._loaded_at > self.refresh_interval):
+            if not self.load(connection, catalog) and self.pairs is None:
+                return False
+        return True
+
+    @staticmethod
+    def unexpired(pair, today):
+        return ((pair["expiration_1"] is None or pair["expiration_1"] >= today)
+                and (pair["expiration_2"] is None or pair["expiration_2"] >= today))
+
+    def get(self, connection):
+        """
+        Return the active pair catalog entries, skipping any pair that expired since
+        the set was loaded.
+        """
+        if not self.ensure_loaded(connection):
+            return []
+
+        today = date.today()
+        with self._lock:
+            return [pair for pair in self.pairs if self.unexpired(pair, today)]
+
+    def pairs_for_options(self, connection, option_ids):
+        """
+        Return the unexpired active pairs that involve any of option_ids, each once.
+        """
+        if not self.ensure_loaded(connection):
+            return []
+
+        today = date.today()
+        found = {}
+        with self._lock:
+            if self._by_option is None:
+                index = {}
+                for pair in self.pairs:
+                    index.setdefault(pair["option_id_1"], []).append(pair)
+                    index.setdefault(pair["option_id_2"], []).append(pair)
+                self._by_option = index
+            for option_id in option_ids:
+                for pair in self._by_option.get(option_id, ()):
+                    if self.unexpired(pair, today):
+                        found[pair["pair_id"]] = pair
+        return list(found.values())
+
+    def prune(self, closed_bet_ids):
+        """
+        Drop every pair that involves one of the closed bets.
+        """
+        closed_bet_ids = set(closed_bet_ids)
+        if not closed_bet_ids:
+            return
+        with self._lock:
+            if self.pairs is None:
+                return
+            before = len(self.pairs)
+            self.pairs = [
+                pair for pair in self.pairs
+                if pair["bet_id_1"] not in closed_bet_ids and pair["bet_id_2"] not in closed_bet_ids
+            ]
+            self._by_option = None
+            print(f"Pruned {before - len(self.pairs)} option pairs on closed events.")
+
+    def invalidate(self):
+        with self._lock:
+            self.pairs = None
+            self._by_option = None
+
+active_pairs = ActivePairSet()
+
 # Unified function to fetch prices and adjust for Polymarket
-def get_prices_by_option_id(option_id: int) -> Optional[Tuple[float, float]]:
+def get_prices_by_option_id(option_id: int, connection=None) -> Optional[Tuple[float, float]]:
     """
     Fetch prices for a given option ID, and adjust if the bet is from Polymarket.
+    Uses the given connection (and its prepared statement), or opens one if none is passed.
     """
-    connection = create_connection()
-    if connection is None:
-        print("Failed to connect to the database.")
-        return None, None
+    own_connection = connection is None
+    if own_connection:
+        connection = create_connection()
+        if connection is None:
+            print("Failed to connect to the database.")
+            return None, None
 
     query = """
     SELECT 
@@ -109,26 +222,39 @@ def get_prices_by_option_id(option_id: int) -> Optional[Tuple[float, float]]:
     """
     
     try:
-        with connection.cursor() as cursor:
-            cursor.execute(query, (option_id,))
-            result = cursor.fetchone()
-            
-            if not result:
+        result = fetch_one(connection, query, (option_id,))
+
+        if not result:
+            # Quotes older than the raw retention only survive as bars
+            bar = latest_bar(connection, option_id)
+            if not bar:
                 print(f"No price data found for option_id {option_id}")
                 return None, None
+            print(f"Prices for option_id {option_id} from its latest price bar: price_yes = {bar[0]}, price_no = {bar[1]}")
+            return bar[0], bar[1]
             
-            raw_price_yes, raw_price_no, website = result
-            print(f"Raw prices for option_id {option_id}: price_yes = {raw_price_yes}, price_no = {raw_price_no}, website = {website}")
+        raw_price_yes, raw_price_no, website = result
+        print(f"Raw prices for option_id {option_id}: price_yes = {raw_price_yes}, price_no = {raw_price_no}, website = {website}")
 
-            return raw_price_yes, raw_price_no
+        return raw_price_yes, raw_price_no
 
-    except mysql.connector.Error as e:
+    except Error as e:
         print(f"Error fetching prices for option_id {option_id}: {e}")
         return None, None
     
     finally:
-        connection.close()
-        #print("Database connection closed.")
+        if own_connection:
+            connection.close()
+
+def get_latest_prices(option_id: int, connection) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Latest (yes, no) prices for an option: from the in-memory market state when an
+    ingester in this process has quoted it, otherwise from the database.
+    """
+    prices = market_state.get_prices(option_id)
+    if prices is None:
+        return get_prices_by_option_id(option_id, connection)
+    return prices
 
 # Fetch website details using the event_id from similar_events table
 def get_website_details(event_id: int, connection):
@@ -149,7 +275,7 @@ def get_website_details(event_id: int, connection):
             else:
                 print(f"No website data found for event_id {event_id}")
                 return None, None
-    except mysql.connector.Error as e:
+    except Error as e:
         print(f"Error fetching website details for event_id {event_id}: {e}")
         return None, None
     
@@ -157,15 +283,13 @@ def get_website_details(event_id: int, connection):
 def get_bet_id_from_option_id(option_id: int, connection) -> Optional[int]:
     query = "SELECT bet_id FROM bet_choice WHERE option_id = %s"
     try:
-        with connection.cursor() as cursor:
-            cursor.execute(query, (option_id,))
-            result = cursor.fetchone()
-            if result:
-                return result[0]
-            else:
-                print(f"No bet ID found for option ID {option_id}")
-                return None
-    except mysql.connector.Error as e:
+        result = fetch_one(connection, query, (option_id,))
+        if result:
+            return result[0]
+        else:
+            print(f"No bet ID found for option ID {option_id}")
+            return None
+    except Error as e:
         print(f"Error fetching bet ID for option ID {option_id}: {e}")
         return None
 
@@ -177,7 +301,7 @@ def bet_id_exists(bet_id: int, connection) -> bool:
             cursor.execute(query, (bet_id,))
             result = cursor.fetchone()
             return result[0] > 0
-    except mysql.connector.Error as e:
+    except Error as e:
         print(f"Error checking if bet_id {bet_id} exists: {e}")
         return False
 
@@ -188,49 +312,82 @@ def insert_arbitrage_opportunity(
     option_id_2: int, 
     profit: float, 
     bet_side_1: str, 
-    bet_side_2: str
+    bet_side_2: str,
+    bet_id_1: Optional[int] = None,
+    bet_id_2: Optional[int] = None,
+    option_name_1: Optional[str] = None,
+    option_name_2: Optional[str] = None
 ):
     """
     Inserts arbitrage opportunities into the arbitrage_opportunities table.
     Fetches and stores option IDs, option names, and bet sides.
+    When the bet IDs and option names are passed in (from the pair catalog, which
+    only holds pairs whose bets exist), the lookups are skipped.
     """
-    # Fetch the corresponding bet IDs for the given option IDs
-    bet_id_1 = get_bet_id_from_option_id(option_id_1, connection)
-    bet_id_2 = get_bet_id_from_option_id(option_id_2, connection)
+    if bet_id_1 is None or bet_id_2 is None or option_name_1 is None or option_name_2 is None:
+        # Fetch the corresponding bet IDs for the given option IDs
+        bet_id_1 = get_bet_id_from_option_id(option_id_1, connection)
+        bet_id_2 = get_bet_id_from_option_id(option_id_2, connection)
+
+        # Check if both bet IDs were found
+        if bet_id_1 is None or bet_id_2 is None:
+            print(f"Cannot insert arbitrage opportunity: One or both option IDs ({option_id_1}, {option_id_2}) could not be mapped to bet IDs.")
+            return
 
-    # Check if both bet IDs were found
-    if bet_id_1 is None or bet_id_2 is None:
-        print(f"Cannot insert arbitrage opportunity: One or both option IDs ({option_id_1}, {option_id_2}) could not be mapped to bet IDs.")
-        return
+        # Fetch the option names for the given option IDs
+        query = """
+        SELECT option_name_1, option_name_2 
+        FROM similar_event_options 
+        WHERE option_id_1 = %s AND option_id_2 = %s
+        """
+        try:
+            event_details = fetch_one(connection, query, (option_id_1, option_id_2))
 
-    # Fetch the option names for the given option IDs
-    query = """
-    SELECT option_name_1, option_name_2 
-    FROM similar_event_options 
-    WHERE option_id_1 = %s AND option_id_2 = %s
-    """
-    try:
-        with connection.cursor(dictionary=True) as cursor:
-            cursor.execute(query, (option_id_1, option_id_2))
-            event_details = cursor.fetchone()
+            if not event_details:
+                print(f"No option names found for option pair ({option_id_1}, {option_id_2}). Skipping insertion...")
+                return
+
+            option_name_1, option_name_2 = event_details
 
-        if not event_details:
-            print(f"No option names found for option pair ({option_id_1}, {option_id_2}). Skipping insertion...")
+        except Error as e:
+            print(f"Error fetching option names for ({option_id_1}, {option_id_2}): {e}")
             return
 
-        option_name_1 = event_details["option_name_1"]
-        option_name_2 = event_details["option_name_2"]
+        # Check if bet IDs exist in the referenced table
+        if not bet_id_exists(bet_id_1, connection) or not bet_id_exists(bet_id_2, connection):
+            print(f"Cannot insert arbitrage opportunity: One or both bet IDs ({bet_id_1}, {bet_id_2}) do not exist in bet_description table.")
+            return
 
+    # A pair that stays profitable is re-evaluated on every sweep and quote update. If
+    # its latest opportunity is still open (not yet archived) at the same sides and
+    # profit, only move that row's timestamp forward instead of recording it again.
+    timestamp = datetime.now()
+    latest_query = """
+    SELECT arb_id, profit, bet_side_1, bet_side_2
+    FROM arbitrage_opportunities
+    WHERE option_id_1 = %s AND option_id_2 = %s
+    ORDER BY arb_id DESC
+    LIMIT 1
+    """
+    try:
+        latest = fetch_one(connection, latest_query, (option_id_1, option_id_2))
+        if (latest is not None and latest[2] == bet_side_1 and latest[3] == bet_side_2
+                and latest[1] is not None and round(float(latest[1]), 2) == round(profit, 2)):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE arbitrage_opportunities SET timestamp = %s WHERE arb_id = %s",
+                    (timestamp, latest[0]),
+                )
+            connection.commit()
+            print(f"Arbitrage opportunity {latest[0]} still open; refreshed its timestamp.")
+            return
     except Error as e:
-        print(f"Error fetching option names for ({option_id_1}, {option_id_2}): {e}")
-        return
-
-    # Check if bet IDs exist in the referenced table
-    if not bet_id_exists(bet_id_1, connection) or not bet_id_exists(bet_id_2, connection):
-        print(f"Cannot insert arbitrage opportunity: One or both bet IDs ({bet_id_1}, {bet_id_2}) do not exist in bet_description table.")
+        print(f"Error checking for an open arbitrage opportunity: {e}")
         return
 
-    # Insert into arbitrage_opportunities table
+    # Insert into arbitrage_opportunities table. The denormalized description, website
+    # and side columns are filled in the same statement, from bet_description, so
+    # populate_arbitrage_opportunities never has to backfill new rows.
     arbitrage_query = """
     INSERT INTO arbitrage_opportunities (
         bet_id1, 
@@ -240,26 +397,50 @@ def insert_arbitrage_opportunity(
         option_name_1, 
         option_name_2, 
         timestamp, 
-        profit
+        profit,
+        bet_description_1,
+        bet_description_2,
+        website_1,
+        website_2,
+        bet_side_1,
+        bet_side_2
     )
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    SELECT
+        bd1.bet_id,
+        bd2.bet_id,
+        %s, %s, %s, %s, %s, %s,
+        bd1.name,
+        bd2.name,
+        bd1.website,
+        bd2.website,
+        %s, %s
+    FROM
+        bet_description bd1
+    JOIN
+        bet_description bd2 ON bd2.bet_id = %s
+    WHERE
+        bd1.bet_id = %s
     """
-    timestamp = datetime.now()
     arbitrage_values = (
-        bet_id_1, 
-        bet_id_2, 
         option_id_1, 
         option_id_2, 
         option_name_1, 
         option_name_2, 
         timestamp, 
-        profit
+        profit,
+        bet_side_1,
+        bet_side_2,
+        bet_id_2,
+        bet_id_1
     )
 
     try:
         with connection.cursor() as cursor:
             # Insert into arbitrage_opportunities table
             cursor.execute(arbitrage_query, arbitrage_values)
+            if cursor.rowcount == 0:
+                print(f"Cannot insert arbitrage opportunity: bet IDs ({bet_id_1}, {bet_id_2}) not found in bet_description.")
+                return
             arb_id = cursor.lastrowid
             connection.commit()
 
@@ -306,10 +487,12 @@ def calculate_kalshi_total_cost(price):
     return total_cost
 
 # Calculate cross-market arbitrage for a pair of option IDs
-def calculate_cross_market_arbitrage(option_id_1, option_id_2, option_name_1, option_name_2, website_1, website_2, connection, initial_amount=100):
+def calculate_cross_market_arbitrage(option_id_1, option_id_2, option_name_1, option_name_2, website_1, website_2, connection, initial_amount=100, bet_id_1=None, bet_id_2=None):
     """
     Calculate arbitrage opportunities for a pair of option IDs, considering the website.
     Assumes a fixed initial amount of $100 for each trade.
+    bet_id_1/bet_id_2 can be passed when already known (e.g. from the pair catalog)
+    to skip looking them up again when an opportunity is stored.
     """
     # Ensure the options are on different platforms
     if website_1 == website_2:
@@ -317,13 +500,16 @@ def calculate_cross_market_arbitrage(option_id_1, option_id_2, option_name_1, op
         return
 
     # Fetch raw prices for both option IDs
-    price_yes_market1, price_no_market1 = map(float, get_prices_by_option_id(option_id_1))
-    price_yes_market2, price_no_market2 = map(float, get_prices_by_option_id(option_id_2))
+    price_yes_market1, price_no_market1 = get_latest_prices(option_id_1, connection)
+    price_yes_market2, price_no_market2 = get_latest_prices(option_id_2, connection)
 
     if None in [price_yes_market1, price_no_market1, price_yes_market2, price_no_market2]:
         print(f"Prices not available for option IDs {option_id_1} or {option_id_2}. Skipping arbitrage calculation.")
         return
 
+    price_yes_market1, price_no_market1 = float(price_yes_market1), float(price_no_market1)
+    price_yes_market2, price_no_market2 = float(price_yes_market2), float(price_no_market2)
+
     if website_1.lower() == "kalshi":
         price_yes_market1 = float(price_yes_market1)
         price_no_market1 = float(price_no_market1)
@@ -396,7 +582,10 @@ def calculate_cross_market_arbitrage(option_id_1, option_id_2, option_name_1, op
               f"Bet {bet_type_2} on {market_bet_2} ({option_name_2}). Profit = ${profit:.2f}")
         
         # Pass the bet sides to insert_arbitrage_opportunity()
-        insert_arbitrage_opportunity(connection, market_bet_1, market_bet_2, profit, bet_type_1, bet_type_2)
+        insert_arbitrage_opportunity(
+            connection, market_bet_1, market_bet_2, profit, bet_type_1, bet_type_2,
+            bet_id_1=bet_id_1, bet_id_2=bet_id_2, option_name_1=option_name_1, option_name_2=option_name_2,
+        )
     else:
         print("\nNo arbitrage opportunity found.\n")
 
@@ -456,7 +645,7 @@ def get_similar_event_ids_with_websites():
             print(f"Fetched similar event pairs with websites: {similar_event_data}")
             return similar_event_data
     
-    except mysql.connector.Error as e:
+    except Error as e:
         print(f"Error fetching similar event pairs: {e}")
         return []
     
@@ -465,52 +654,44 @@ def get_similar_event_ids_with_websites():
         #print("Database connection closed.")
 
 
+def evaluate_pair(pair, connection):
+    """
+    Calculate arbitrage for one active pair catalog entry.
+    """
+    if not pair["website_1"] or not pair["website_2"]:
+        print(f"No website information found for event_id {pair['event_id']}. Skipping...")
+        return
+
+    calculate_cross_market_arbitrage(
+        pair["option_id_1"], pair["option_id_2"],
+        pair["option_name_1"], pair["option_name_2"],
+        pair["website_1"], pair["website_2"],
+        connection,
+        bet_id_1=pair["bet_id_1"], bet_id_2=pair["bet_id_2"],
+    )
+
 # Main script
 def update_arbitrage():
     connection = create_connection()  # Establish the database connection
 
     if connection is None:
         print("Failed to connect to the database. Exiting...")
-        exit()
+        return
 
-    # Fetch all similar option pairs from the database
-    similar_option_pairs = get_similar_option_pairs()
+    # Only evaluate pairs whose events are both still open
+    similar_option_pairs = active_pairs.get(connection)
 
     if not similar_option_pairs:
         print("No similar options found for arbitrage analysis.")
         connection.close()
-        exit()
+        return
 
     print("\nAnalyzing Arbitrage Opportunities:\n")
 
-    for option_id_1, option_id_2, event_id in similar_option_pairs:
-        # Fetch the option names from similar_event_options
-        query = """
-        SELECT option_name_1, option_name_2
-        FROM similar_event_options
-        WHERE option_id_1 = %s AND option_id_2 = %s
-        """
-        with connection.cursor(dictionary=True) as cursor:
-            cursor.execute(query, (option_id_1, option_id_2))
-            event_details = cursor.fetchone()
-
-        if not event_details:
-            print(f"No option names found for option pair ({option_id_1}, {option_id_2}). Skipping...")
-            continue
-
-        option_name_1 = event_details["option_name_1"]
-        option_name_2 = event_details["option_name_2"]
-
-        # Fetch the website information from similar_events
-        website_1, website_2 = get_website_details(event_id, connection)
-
-        if not website_1 or not website_2:
-            print(f"No website information found for event_id {event_id}. Skipping...")
-            continue
-
+    for pair in similar_option_pairs:
         # Calculate and display arbitrage opportunities for the given pair of option IDs
         print()
-        calculate_cross_market_arbitrage(option_id_1, option_id_2, option_name_1, option_name_2, website_1, website_2, connection)
+        evaluate_pair(pair, connection)
 
     connection.close()  # Close the database connection
     print("\nArbitrage Analysis Complete.")
@@ -0,0 +1,94 @@
+import threading
+import time
+import event_bus
+from arbitrage_calculator import active_pairs, evaluate_pair
+from storage import Error
+
+# Event-driven arbitrage.
+# The worker subscribes to QUOTES_UPDATED and, as soon as an ingester records quotes
+# that moved, re-evaluates only the active pairs involving those options, using
+# prices from the in-memory market state. Updates that land while a batch is being
+# evaluated are merged into the next batch, so a burst from a catalog sweep costs one
+# evaluation per affected pair rather than one per quote.
+# Started by `python update.py --loop`; the periodic "arbitrage" job still sweeps every
+# pair as a backstop.
+
+class ArbitrageWorker:
+    """
+    Background thread with its own database connection that evaluates the pairs
+    affected by each quote update.
+
+        worker = ArbitrageWorker().start()
+        ...
+        worker.stop()
+    """
+    def __init__(self):
+        self.pairs_evaluated = 0
+        self._pending = set()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        event_bus.subscribe(event_bus.QUOTES_UPDATED, self.on_quotes_updated)
+        self._thread = threading.Thread(target=self._run, name="arbitrage-worker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        event_bus.unsubscribe(event_bus.QUOTES_UPDATED, self.on_quotes_updated)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def on_quotes_updated(self, option_ids):
+        # Runs on the ingester's thread: only queue the ids
+        with self._condition:
+            self._pending.update(option_ids)
+            self._condition.notify()
+
+    def _run(self):
+        import main
+
+        connection = None
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    break
+                option_ids, self._pending = self._pending, set()
+
+            if connection is None:
+                connection = main.create_connection()
+                if connection is None:
+                    print("Arbitrage worker failed to connect to the database; skipping updates.")
+                    continue
+
+            try:
+                self.evaluate(connection, option_ids)
+            except Exception as e:
+                # Anything escaping here would end the thread and silently stop
+                # event-driven arbitrage; start the next batch on a fresh connection
+                print(f"Error evaluating arbitrage for updated quotes: {e}")
+                try:
+                    connection.close()
+                except Error:
+                    pass
+                connection = None
+
+        if connection is not None:
+            connection.close()
+
+    def evaluate(self, connection, option_ids):
+        started = time.monotonic()
+        pairs = active_pairs.pairs_for_options(connection, option_ids)
+        for pair in pairs:
+            evaluate_pair(pair, connection)
+        self.pairs_evaluated += len(pairs)
+        if pairs:
+            print(f"Re-evaluated {len(pairs)} pairs for {len(option_ids)} updated options "
+                  f"in {(time.monotonic() - started) * 1000:.1f} ms.")
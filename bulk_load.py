@@ -0,0 +1,172 @@
+import csv
+import os
+import sys
+import tempfile
+import storage
+from storage import Error
+
+# Opt-in bulk load path for large writes.
+# With BULK_LOAD=1 in the environment, upserts of at least BULK_LOAD_MIN_ROWS rows are
+# written to a temporary tab-separated file, loaded into a temporary staging table
+# with LOAD DATA LOCAL INFILE and merged into the target with a single
+# INSERT ... SELECT ... ON DUPLICATE KEY UPDATE, instead of executemany row sets.
+# If the server refuses local infile, rows are staged with a multi-row insert instead
+# and merged the same way. Bulk mode only applies to the MySQL backend.
+#
+#   BULK_LOAD=1 python update.py                full update pass with bulk writes
+#   python bulk_load.py price prices.csv        backfill a CSV (header row = column names)
+
+BULK_LOAD = os.getenv("BULK_LOAD", "").lower() in ("1", "true", "yes") and storage.BACKEND == "mysql"
+BULK_LOAD_MIN_ROWS = 500
+
+# Primary key of each table that can be backfilled from a file
+KEY_COLUMNS = {
+    "price": ("option_id", "timestamp"),
+    "bet_choice": ("option_id",),
+    "bet_description": ("bet_id",),
+}
+
+# mysql-connector / server errors meaning LOAD DATA LOCAL isn't allowed
+LOCAL_INFILE_ERRORS = {1148, 2068, 3948}
+
+# Cleared the first time the server refuses LOAD DATA LOCAL, so later batches go
+# straight to the insert fallback
+_local_infile_ok = True
+
+def encode_field(value):
+    """
+    Encode one value for LOAD DATA's default format (tab-separated, backslash escapes,
+    \\N for NULL).
+    """
+    if value is None:
+        return "\\N"
+    text = str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+def write_staging_file(rows):
+    handle = tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".tsv", delete=False)
+    with handle:
+        for row in rows:
+            handle.write("\t".join(encode_field(value) for value in row))
+            handle.write("\n")
+    return handle.name
+
+def merge_query(table, staging_table, columns, update_columns):
+    column_list = ", ".join(columns)
+    updates = ", ".join(f"{column}=VALUES({column})" for column in update_columns)
+    return f"""
+    INSERT INTO {table} ({column_list})
+    SELECT {column_list} FROM {staging_table}
+    ON DUPLICATE KEY UPDATE {updates}
+    """
+
+def stage_rows(cursor, staging_table, columns, rows):
+    """
+    Load rows into staging_table, through a temporary file and LOAD DATA LOCAL INFILE
+    when the server allows it. Later duplicates of a key replace earlier ones, as they
+    would with executemany and ON DUPLICATE KEY UPDATE.
+    """
+    global _local_infile_ok
+    column_list = ", ".join(columns)
+
+    if _local_infile_ok:
+        path = write_staging_file(rows)
+        try:
+            cursor.execute(f"""
+                LOAD DATA LOCAL INFILE %s
+                REPLACE INTO TABLE {staging_table}
+                CHARACTER SET utf8mb4
+                ({column_list})
+            """, (path,))
+            return
+        except Error as e:
+            if e.errno not in LOCAL_INFILE_ERRORS:
+                raise
+            _local_infile_ok = False
+            print(f"LOAD DATA LOCAL INFILE is not allowed ({e.msg}); staging with inserts instead.")
+        finally:
+            os.remove(path)
+
+    placeholders = ", ".join(["%s"] * len(columns))
+    cursor.executemany(
+        f"REPLACE INTO {staging_table} ({column_list}) VALUES ({placeholders})",
+        rows
+    )
+
+def bulk_upsert(cursor, table, columns, rows, update_columns):
+    """
+    Upsert rows into table through a temporary staging table. Runs in the caller's
+    transaction and does not commit.
+    """
+    staging_table = f"staging_{table}"
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+    cursor.execute(f"CREATE TEMPORARY TABLE {staging_table} LIKE {table}")
+    try:
+        stage_rows(cursor, staging_table, columns, rows)
+        cursor.execute(merge_query(table, staging_table, columns, update_columns))
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+
+def upsert_rows(cursor, query, table, columns, rows, update_columns):
+    """
+    Write rows with `query` (an INSERT ... ON DUPLICATE KEY UPDATE over `columns`), or
+    through bulk_upsert when bulk mode is on and the batch is large enough.
+    """
+    if not rows:
+        return
+    if BULK_LOAD and len(rows) >= BULK_LOAD_MIN_ROWS:
+        bulk_upsert(cursor, table, columns, rows, update_columns)
+    else:
+        cursor.executemany(query, rows)
+
+def load_csv(connection, table, path):
+    """
+    Backfill table from a CSV file whose header row names the columns. The file is
+    loaded straight into a staging table and merged in one transaction; every
+    non-key column is updated on existing rows.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        columns = next(csv.reader(f))
+    update_columns = [column for column in columns if column not in KEY_COLUMNS[table]]
+    staging_table = f"staging_{table}"
+    column_list = ", ".join(columns)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+            cursor.execute(f"CREATE TEMPORARY TABLE {staging_table} LIKE {table}")
+            cursor.execute(f"""
+                LOAD DATA LOCAL INFILE %s
+                REPLACE INTO TABLE {staging_table}
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+                LINES TERMINATED BY '\\n'
+                IGNORE 1 LINES
+                ({column_list})
+            """, (os.path.abspath(path),))
+            staged = cursor.rowcount
+            cursor.execute(merge_query(table, staging_table, columns, update_columns))
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+            connection.commit()
+        print(f"Loaded {staged} rows from {path} into {table}.")
+        return True
+    except Error as e:
+        connection.rollback()
+        print(f"Error bulk loading {path} into {table}: {e}")
+        return False
+
+if __name__ == "__main__":
+    import main
+
+    if len(sys.argv) != 3 or sys.argv[1] not in KEY_COLUMNS:
+        print(f"Usage: python bulk_load.py <{'|'.join(KEY_COLUMNS)}> <file.csv>")
+        sys.exit(2)
+
+    connection = main.create_connection(allow_local_infile=True)
+    if connection is None:
+        sys.exit(1)
+    try:
+        loaded = load_csv(connection, sys.argv[1], sys.argv[2])
+    finally:
+        connection.close()
+    sys.exit(0 if loaded else 1)
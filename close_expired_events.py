@@ -1,61 +1,73 @@
-from datetime import datetime
-import mysql.connector
-from mysql.connector import Error
-import main  
+from storage import Error
+import main
+
+# Max events closed per transaction, to keep row locks short
+CLOSE_CHUNK_SIZE = 1000
 
 #update events to closed if they are past
-def close_expired_events(connection):
-    query_select = """
-    SELECT bet_id, expiration_date 
-    FROM bet_description 
-    WHERE status = 'open'
+def close_expired_events(connection, chunk_size=CLOSE_CHUNK_SIZE):
     """
-    
-    query_update = """
-    UPDATE bet_description 
-    SET status = 'closed'
-    WHERE bet_id = %s
+    Close every open event whose expiration date has passed, together with its options.
+    Works in chunks of chunk_size events, each committed on its own: the ids are picked
+    with an indexed lookup on (status, expiration_date), then both tables are updated
+    with one set-based statement each.
+    Returns the list of bet_ids that were closed.
     """
-
-    query_update2 = """
-    UPDATE bet_choice 
-    SET outcome = 'closed'
-    WHERE bet_id = %s
+    query_select = """
+    SELECT bet_id
+    FROM bet_description
+    WHERE status = 'open' AND expiration_date < CURDATE()
+    LIMIT %s
     """
-    
+
+    closed_events = []
+
     try:
         with connection.cursor() as cursor:
-            cursor.execute(query_select)
-            rows = cursor.fetchall()
-            
-            closed_events = []
-            current_time = datetime.now().date()
-            
-            for row in rows:
-                bet_id, expiration_date = row
-                
-                if isinstance(expiration_date, str):
-                    expiration_date = datetime.strptime(expiration_date, "%Y-%m-%d %H:%M:%S")
-                
-                if expiration_date and expiration_date < current_time:
-                    closed_events.append(bet_id)
-            
-            if closed_events:
-                cursor.executemany(query_update, [(bet_id,) for bet_id in closed_events])
-                cursor.executemany(query_update2, [(bet_id,) for bet_id in closed_events])
+            while True:
+                cursor.execute(query_select, (chunk_size,))
+                bet_ids = [row[0] for row in cursor.fetchall()]
+                if not bet_ids:
+                    break
+
+                placeholders = ", ".join(["%s"] * len(bet_ids))
+                cursor.execute(f"""
+                    UPDATE bet_choice
+                    SET outcome = 'closed'
+                    WHERE bet_id IN ({placeholders})
+                """, bet_ids)
+                cursor.execute(f"""
+                    UPDATE bet_description
+                    SET status = 'closed'
+                    WHERE bet_id IN ({placeholders}) AND status = 'open'
+                """, bet_ids)
                 connection.commit()
-                print(f"Updated {len(closed_events)} events to 'closed' status.")
-            else:
-                print("No expired events found.")
+
+                closed_events.extend(bet_ids)
+                if len(bet_ids) < chunk_size:
+                    break
+
+        if closed_events:
+            print(f"Updated {len(closed_events)} events to 'closed' status.")
+        else:
+            print("No expired events found.")
     except Error as e:
+        connection.rollback()
         print(f"Error while updating expired events: {e}")
 
+    return closed_events
+
 def close_past_events():
+    """
+    Close expired events. Returns the closed bet_ids (empty if nothing closed or no connection).
+    """
     connection = main.create_connection()
 
     if connection:
-        close_expired_events(connection)
+        closed_events = close_expired_events(connection)
         connection.close()
         print("Database connection closed.")
+        return closed_events
     else:
         print("Failed to connect to the database.")
+        return []
@@ -0,0 +1,34 @@
+import threading
+
+# In-process event bus.
+# Handlers are called synchronously on the publishing thread, in the order they
+# subscribed, so they should only hand the payload off (e.g. to a queue) and return.
+
+# Payload: list of option_ids whose quote changed (published by market_state.record_quotes)
+QUOTES_UPDATED = "quotes_updated"
+
+_subscribers = {}
+_lock = threading.Lock()
+
+def subscribe(topic, handler):
+    with _lock:
+        _subscribers.setdefault(topic, []).append(handler)
+
+def unsubscribe(topic, handler):
+    with _lock:
+        handlers = _subscribers.get(topic, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+def publish(topic, payload):
+    """
+    Call every handler subscribed to topic with payload. A failing handler is reported
+    and skipped, so it can't break the publisher.
+    """
+    with _lock:
+        handlers = list(_subscribers.get(topic, ()))
+    for handler in handlers:
+        try:
+            handler(payload)
+        except Exception as e:
+            print(f"Error handling {topic} event: {e}")
@@ -0,0 +1,112 @@
+import ast
+import json
+from datetime import datetime
+
+# Fast decoding helpers shared by the venue parsers.
+
+# orjson is several times faster than the standard library on whole API pages;
+# fall back to json when it isn't installed.
+try:
+    import orjson
+
+    def loads(data):
+        return orjson.loads(data)
+except ImportError:
+    def loads(data):
+        return json.loads(data)
+
+# ijson lets large pages be parsed incrementally; it's optional
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+def stream_filtered_items(raw, array_key, keep_key, keep_values, extra_keys=()):
+    """
+    Incrementally parse a JSON object from the file-like `raw` and return
+    (kept_items, extras): the items of its top-level `array_key` array whose `keep_key`
+    is in keep_values, plus the values of any top-level scalar keys in extra_keys.
+    An item is dropped as soon as its keep_key is seen with another value, so the rest
+    of it (e.g. nested markets) is never built, and only kept items are held in memory.
+    Requires ijson.
+    """
+    item_prefix = f"{array_key}.item"
+    keep_prefix = f"{item_prefix}.{keep_key}"
+    kept = []
+    extras = {}
+    builder = None
+    skipping = False
+
+    for prefix, event, value in ijson.parse(raw, use_float=True):
+        if prefix == item_prefix and event == "start_map":
+            builder = ijson.ObjectBuilder()
+            skipping = False
+        elif prefix == item_prefix and event == "end_map":
+            if builder is not None:
+                builder.event(event, value)
+                if builder.value.get(keep_key) in keep_values:
+                    kept.append(builder.value)
+            builder = None
+            skipping = False
+            continue
+        elif prefix in extra_keys and event in ("string", "number", "boolean", "null"):
+            extras[prefix] = value
+            continue
+
+        if skipping:
+            continue
+        if prefix == keep_prefix and value not in keep_values:
+            builder = None
+            skipping = True
+            continue
+        if builder is not None:
+            builder.event(event, value)
+
+    return kept, extras
+
+def parse_json_list(value):
+    """
+    Decode a stringified list such as Polymarket's outcomes/outcomePrices
+    ('["Yes", "No"]'). Those fields are JSON, so this avoids ast.literal_eval except as
+    a fallback for anything that isn't. Returns [] if the value can't be decoded.
+    """
+    if isinstance(value, list):
+        return value
+    if not value:
+        return []
+    try:
+        result = loads(value)
+    except ValueError:
+        try:
+            result = ast.literal_eval(value)
+        except (ValueError, SyntaxError) as e:
+            print(f"Error: {e}")
+            return []
+    return result if isinstance(result, list) else []
+
+_FALLBACK_FORMATS = (
+    "%Y-%m-%dT%H:%M:%SZ",
+    "%Y-%m-%dT%H:%M:%S.%fZ",
+    "%Y-%m-%dT%H:%M:%S",
+)
+
+def parse_iso_datetime(value):
+    """
+    Parse an ISO-8601 timestamp ("2024-11-05T12:00:00Z", with or without fractional
+    seconds) into a naive datetime. Uses datetime.fromisoformat, which is much faster
+    than trying strptime formats one by one, and only falls back to strptime for
+    strings it rejects. Returns None if nothing matches.
+    """
+    if not value:
+        return None
+    text = value[:-1] if value.endswith("Z") else value
+    try:
+        return datetime.fromisoformat(text).replace(tzinfo=None)
+    except ValueError:
+        pass
+    for fmt in _FALLBACK_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
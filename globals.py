@@ -10,3 +10,7 @@ def add_to_arbitrage_sides_lookup(arb_id, bet_side_1, bet_side_2):
     }
     print(f"Added to arbitrage_sides_lookup: arb_id={arb_id}, bet_side_1={bet_side_1}, bet_side_2={bet_side_2}")
     print(f"Current state of arbitrage_sides_lookup: {arbitrage_sides_lookup}")
+
+def remove_from_arbitrage_sides_lookup(arb_ids):
+    for arb_id in arb_ids:
+        arbitrage_sides_lookup.pop(arb_id, None)
@@ -0,0 +1,181 @@
+import threading
+from datetime import timedelta
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from rate_limiter import AdaptiveLimiter, parse_retry_after
+
+# Shared HTTP layer for the venue APIs.
+# One persistent session per host keeps connections (and TLS handshakes) alive
+# across requests and runs, and a per-host rate limiter (see rate_limiter) caps
+# the request rate and how many requests we have in flight against each venue.
+
+# Only advertise brotli if a decoder is installed, otherwise urllib3 can't decode it
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+# (connect, read) timeout in seconds
+DEFAULT_TIMEOUT = (5, 30)
+
+# Max concurrent requests per host
+HOST_LIMITS = {
+    "api.elections.kalshi.com": 4,
+    "gamma-api.polymarket.com": 8,
+}
+DEFAULT_HOST_LIMIT = 4
+
+# Sustained requests per second per host
+HOST_RATES = {
+    "api.elections.kalshi.com": 10,
+    "gamma-api.polymarket.com": 10,
+}
+DEFAULT_HOST_RATE = 5
+
+# Statuses that mean "slow down and try again"
+RETRY_STATUSES = {429, 503}
+MAX_RETRIES = 5
+
+# requests_cache policy for cached (catalog metadata) requests.
+# Responses expire after the TTL of the first matching URL pattern (DEFAULT_CACHE_TTL
+# otherwise). Expired responses that carry an ETag or Last-Modified are revalidated
+# with a conditional request, so an unchanged page costs a 304 instead of a download.
+# Anything that carries quotes must be fetched with cached=False instead.
+CACHE_NAME = "requests_cache"
+DEFAULT_CACHE_TTL = 300
+CACHE_URL_TTLS = {
+    "gamma-api.polymarket.com/tags*": 24 * 3600,
+}
+# Max responses kept in the cache file before the oldest are evicted, and the
+# max age of any response (this also clears entries written before TTLs existed)
+CACHE_MAX_ENTRIES = 5000
+CACHE_MAX_AGE = timedelta(days=7)
+
+DEFAULT_HEADERS = {
+    "accept": "application/json",
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+
+_sessions = {}
+_cached_sessions = {}
+_limiters = {}
+_lock = threading.Lock()
+
+def _host_limit(host):
+    return HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT)
+
+def _configure(session, host):
+    # Size the pool to the concurrency cap so every in-flight request can reuse a connection
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_host_limit(host))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+def get_session(host):
+    """
+    Return the shared (uncached) session for a host, creating it on first use.
+    """
+    with _lock:
+        if host not in _sessions:
+            _sessions[host] = _configure(requests.Session(), host)
+        return _sessions[host]
+
+def get_cached_session(host):
+    """
+    Return the shared requests_cache session for a host, creating it on first use.
+    """
+    with _lock:
+        if host not in _cached_sessions:
+            import requests_cache
+            session = requests_cache.CachedSession(
+                CACHE_NAME,
+                expire_after=DEFAULT_CACHE_TTL,
+                urls_expire_after=CACHE_URL_TTLS,
+                stale_if_error=True,
+            )
+            _cached_sessions[host] = _configure(session, host)
+            trim_cache(session)
+        return _cached_sessions[host]
+
+def trim_cache(session, max_entries=CACHE_MAX_ENTRIES):
+    """
+    Drop unreadable responses and anything older than CACHE_MAX_AGE, then evict the
+    responses closest to expiry until at most max_entries remain, so the cache file
+    stays bounded. Recently expired responses are kept so they can still be revalidated.
+    """
+    try:
+        session.cache.delete(invalid=True, older_than=CACHE_MAX_AGE)
+        excess = len(session.cache.responses) - max_entries
+        if excess > 0:
+            oldest = [response.cache_key for response in session.cache.responses.sorted(key="expires", limit=excess)]
+            session.cache.delete(*oldest)
+            print(f"Evicted {len(oldest)} responses from the HTTP cache.")
+    except Exception as e:
+        print(f"Error trimming HTTP cache: {e}")
+
+def trim_all_caches():
+    with _lock:
+        sessions = list(_cached_sessions.values())
+    for session in sessions:
+        trim_cache(session)
+
+def get_limiter(host):
+    """
+    Return the rate limiter shared by every request to a host, creating it on first use.
+    """
+    with _lock:
+        if host not in _limiters:
+            _limiters[host] = AdaptiveLimiter(HOST_RATES.get(host, DEFAULT_HOST_RATE), _host_limit(host))
+        return _limiters[host]
+
+def get(url, params=None, headers=None, timeout=DEFAULT_TIMEOUT, cached=False, stream=False):
+    """
+    GET a venue URL through the shared session and rate limiter for its host.
+    429/503 responses are retried (up to MAX_RETRIES) after the venue's Retry-After,
+    and every worker hitting that host backs off with it. If the last retry is still
+    throttled, that response is returned.
+
+    Args:
+        url (str): Full request URL.
+        params: Query parameters (dict or list of tuples).
+        headers (dict): Extra headers, merged over the session defaults.
+        timeout: Request timeout, (connect, read) in seconds.
+        cached (bool): Use the host's requests_cache session (see CACHE_URL_TTLS) instead
+            of the plain one. Leave False for anything price-sensitive.
+        stream (bool): Don't read the body up front, so it can be parsed incrementally
+            from response.raw. The caller must consume or close the response.
+
+    Returns:
+        requests.Response
+    """
+    host = urlsplit(url).netloc
+    session = get_cached_session(host) if cached else get_session(host)
+    limiter = get_limiter(host)
+
+    for attempt in range(MAX_RETRIES + 1):
+        with limiter.slot():
+            response = session.get(url, params=params, headers=headers, timeout=timeout, stream=stream)
+
+        if response.status_code in RETRY_STATUSES:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            delay = limiter.on_throttle(retry_after, attempt)
+            if attempt == MAX_RETRIES:
+                # Out of retries: the other workers still back off, and the caller
+                # gets the throttled response to handle like any other error status
+                print(f"Throttled by {host} ({response.status_code}), giving up after {MAX_RETRIES} retries")
+                return response
+            response.close()
+            print(f"Throttled by {host} ({response.status_code}), retrying in {delay:.1f}s")
+            continue
+
+        # Only a successful response lets the limiter ramp concurrency back up
+        if response.ok:
+            limiter.on_success()
+        return response
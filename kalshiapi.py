@@ -1,59 +1,122 @@
 import requests
-import requests_cache
-import mysql.connector
-from mysql.connector import Error
+import http_client
+import fast_decode
+from fast_decode import loads, parse_iso_datetime
+from storage import Error
 from datetime import datetime
 from tqdm import tqdm
 import hashlib
 import main
+from sweep_checkpoint import SweepCheckpoint
+from bulk_load import upsert_rows
+from price_writer import PriceWriter
+from market_state import record_quotes
+from prepared_statements import fetch_one
 
 def parse_date(date_str):
-    formats = [
-        "%Y-%m-%dT%H:%M:%SZ",
-        "%Y-%m-%dT%H:%M:%S.%fZ",
-        "%Y-%m-%dT%H:%M:%S"
-    ]
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt).strftime("%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            continue
-    return None
+    parsed = parse_iso_datetime(date_str)
+    # str() of a naive datetime without microseconds is "%Y-%m-%d %H:%M:%S", without strftime's cost
+    return str(parsed.replace(microsecond=0)) if parsed else None
 
-def fetch_kalshi_events():
-    session = requests_cache.CachedSession('requests_cache')
-    limit = 200
-    events = []
-    cursor = None
+POLITICAL_CATEGORIES = {"Politics", "World", "Economics"}
 
-    print("Fetching events from Kalshi API...")
+def parse_event_page(response):
+    """
+    Parse one events page into (political_events, next_cursor).
+    With ijson installed the body is parsed as it streams in and other categories are
+    dropped while decoding; otherwise the whole page is decoded and then filtered.
+    """
+    if fast_decode.ijson is not None:
+        response.raw.decode_content = True
+        try:
+            political_events, extras = fast_decode.stream_filtered_items(
+                response.raw, "events", "category", POLITICAL_CATEGORIES, extra_keys=("cursor",)
+            )
+        finally:
+            response.close()
+        return political_events, extras.get("cursor") or None
+
+    r = fast_decode.loads(response.content)
+    batch = r.get("events", [])
+    political_events = [event for event in batch if event.get("category") in POLITICAL_CATEGORIES]
+    return political_events, r.get("cursor") or None
+
+def iter_kalshi_event_pages(cursor=None):
+    """
+    Walk the open-events catalog page by page, starting at `cursor` (None for the first page).
+    Yields (page_cursor, next_cursor, political_events) for each page. next_cursor is None
+    on the last page; if the walk fails partway, the generator just stops early.
+    """
+    limit = 200
     url = "https://api.elections.kalshi.com/trade-api/v2/events"
-    headers = {"accept": "application/json"}
 
     while True:
         params = {"limit": limit, "with_nested_markets": True, "status": "open"}
         if cursor:
             params["cursor"] = cursor
 
-        response = session.get(url, headers=headers, params=params)
+        try:
+            # Nested markets carry live quotes, so this must never be served from cache
+            response = http_client.get(url, params=params, stream=True)
+        except requests.RequestException as e:
+            print(f"Failed to fetch data: {e}")
+            return
 
         if response.status_code != 200:
             print(f"Failed to fetch data: {response.status_code} - {response.text}")
-            break
+            return
 
-        r = response.json()
-        batch = r.get("events", [])
-        political_events = [event for event in batch if event.get("category") in ["Politics", "World", "Economics"]]
-        events.extend(political_events)
+        try:
+            political_events, next_cursor = parse_event_page(response)
+        except Exception as e:
+            # Covers connection drops mid-stream as well as malformed JSON
+            print(f"Failed to parse events page: {e}")
+            return
 
-        print(f"Fetched {len(political_events)} political events (Total: {len(events)})")
-        cursor = r.get("cursor")
+        yield cursor, next_cursor, political_events
+
+        cursor = next_cursor
         if not cursor:
-            break
+            return
+
+def fetch_kalshi_events():
+    events = []
+
+    print("Fetching events from Kalshi API...")
+    for _, _, political_events in iter_kalshi_event_pages():
+        events.extend(political_events)
+        print(f"Fetched {len(political_events)} political events (Total: {len(events)})")
 
     print(f"Total political events fetched: {len(events)}")
     return events
 
+def fetch_kalshi_markets(tickers, batch_size=100):
+    """
+    Fetch current quotes for specific markets by ticker, batch_size tickers per request.
+    Used for targeted refreshes of matched markets instead of a full catalog sweep.
+    Returns a list of market dicts.
+    """
+    url = "https://api.elections.kalshi.com/trade-api/v2/markets"
+    markets = []
+
+    tickers = list(tickers)
+    for i in range(0, len(tickers), batch_size):
+        batch = tickers[i:i + batch_size]
+        params = {"tickers": ",".join(batch), "limit": len(batch)}
+        try:
+            response = http_client.get(url, params=params)
+        except requests.RequestException as e:
+            print(f"Failed to fetch markets: {e}")
+            continue
+
+        if response.status_code != 200:
+            print(f"Failed to fetch markets: {response.status_code} - {response.text}")
+            continue
+
+        markets.extend(loads(response.content).get("markets", []))
+
+    return markets
+
 def get_max_option_id(connection):
     """Get the maximum option_id currently in the database."""
     try:
@@ -106,26 +169,23 @@ def clear_kalshi_events(connection):
         print(f"Error clearing Kalshi events: {e}")
 
 def check_event_exists(connection, event_name, expiration_date):
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT bet_id FROM bet_description 
-            WHERE name = %s AND expiration_date = %s
-        """, (event_name, expiration_date))
-        result = cursor.fetchone() 
-        cursor.fetchall()  
-        return result
+    return fetch_one(connection, """
+        SELECT bet_id FROM bet_description 
+        WHERE name = %s AND expiration_date = %s
+    """, (event_name, expiration_date))
 
 def check_market_exists(connection, bet_id, market_subtitle):
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT option_id FROM bet_choice 
-            WHERE bet_id = %s AND name = %s
-        """, (bet_id, market_subtitle))
-        result = cursor.fetchone() 
-        cursor.fetchall() 
-        return result
-
-def insert_event_data(connection, events):
+    return fetch_one(connection, """
+        SELECT option_id FROM bet_choice 
+        WHERE bet_id = %s AND name = %s
+    """, (bet_id, market_subtitle))
+
+def insert_event_data(connection, events, price_writer=None, on_written=None):
+    """
+    Upsert a page of events with their options and quotes. With a price_writer, events
+    and options are committed here and the quotes are handed to the writer, which
+    calls on_written once they are stored. Returns True unless the upsert failed.
+    """
     bet_description_query = """
     INSERT INTO bet_description (bet_id, name, expiration_date, website, status, is_arbitrage)
     VALUES (%s, %s, %s, %s, %s, %s)
@@ -138,11 +198,18 @@ def insert_event_data(connection, events):
     """
 
     bet_choice_query = """
-    INSERT INTO bet_choice (option_id, bet_id, name, outcome)
-    VALUES (%s, %s, %s, %s)
+    INSERT INTO bet_choice (option_id, bet_id, name, outcome, ticker)
+    VALUES (%s, %s, %s, %s, %s)
     ON DUPLICATE KEY UPDATE 
         name=VALUES(name),
-        outcome=VALUES(outcome)
+        outcome=VALUES(outcome),
+        ticker=VALUES(ticker)
+    """
+
+    # Backfill tickers on options created before the ticker column existed
+    ticker_query = """
+    UPDATE bet_choice SET ticker = %s
+    WHERE option_id = %s AND ticker IS NULL
     """
 
     price_query = """
@@ -159,9 +226,10 @@ def insert_event_data(connection, events):
 
     bet_description_values = []
     bet_choice_values = []
+    ticker_values = []
     price_values = []
 
-    option_id = get_max_option_id(connection) + 1 
+    next_option_id = get_max_option_id(connection) + 1 
 
     print("Inserting event data into the database...")
     for event in events:
@@ -185,39 +253,94 @@ def insert_event_data(connection, events):
             volume = market.get("volume", 0)
             yes_price = market.get("yes_bid", 0)
             no_price = market.get("no_bid", 0)
+            ticker = market.get("ticker")
 
             existing_market = check_market_exists(connection, bet_id, market_subtitle)
 
             if existing_market:
                 option_id = existing_market[0]
+                if ticker:
+                    ticker_values.append((ticker, option_id))
             else:
-                option_id = get_max_option_id(connection) + 1
-                bet_choice_values.append((option_id, bet_id, market_subtitle, "pending"))
+                # New options aren't in the table until the end of the run, so hand out ids locally
+                option_id = next_option_id
+                next_option_id += 1
+                bet_choice_values.append((option_id, bet_id, market_subtitle, "pending", ticker))
             
             price_values.append((option_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), volume, yes_price, no_price, yes_price, no_price))
 
-            option_id += 1 
-
     try:
         with connection.cursor() as cursor:
-            cursor.executemany(bet_description_query, bet_description_values)
-            cursor.executemany(bet_choice_query, bet_choice_values)
-            cursor.executemany(price_query, price_values)
+            upsert_rows(cursor, bet_description_query, "bet_description",
+                        ("bet_id", "name", "expiration_date", "website", "status", "is_arbitrage"),
+                        bet_description_values,
+                        ("name", "expiration_date", "website", "status", "is_arbitrage"))
+            upsert_rows(cursor, bet_choice_query, "bet_choice",
+                        ("option_id", "bet_id", "name", "outcome", "ticker"),
+                        bet_choice_values,
+                        ("name", "outcome", "ticker"))
+            if ticker_values:
+                cursor.executemany(ticker_query, ticker_values)
+            if price_writer is None:
+                upsert_rows(cursor, price_query, "price",
+                            ("option_id", "timestamp", "volume", "yes_price", "no_price", "yes_odds", "no_odds"),
+                            price_values,
+                            ("volume", "yes_price", "no_price", "yes_odds", "no_odds"))
             connection.commit()
-            print("Inserted/Updated all event data successfully.")
     except Error as e:
         print(f"Error inserting/updating event data: {e}")
+        return False
+
+    if price_writer is not None:
+        price_writer.submit(price_values, on_written)
+    record_quotes("kalshi", price_values)
+    print("Inserted/Updated all event data successfully.")
+    return True
 
 
+def sweep_kalshi_events(connection):
+    """
+    Fetch and write the catalog one page at a time. Quotes go through a write-behind
+    PriceWriter so the next page is fetched while they are written; a page is
+    checkpointed once its quotes are committed, so an interrupted sweep resumes from
+    its last stored cursor on the next run.
+    """
+    checkpoint = SweepCheckpoint("kalshi")
+    cursor = checkpoint.load()
+    total = 0
+    completed = False
+
+    print("Fetching events from Kalshi API...")
+    with PriceWriter() as writer:
+        for page_cursor, next_cursor, political_events in iter_kalshi_event_pages(cursor):
+            if writer.failed:
+                break
+            page_id = page_cursor or "first"
+
+            def save(page_id=page_id, next_cursor=next_cursor):
+                checkpoint.save(page_id, next_cursor)
+
+            if not checkpoint.is_written(page_id):
+                if not insert_event_data(connection, political_events, writer, save):
+                    break
+                total += len(political_events)
+                print(f"Wrote {len(political_events)} political events (Total: {total})")
+            else:
+                # Keep checkpoints in order behind the pages still being written
+                writer.submit([], save)
+            completed = next_cursor is None
+
+    if completed and not writer.failed:
+        checkpoint.clear()
+        print(f"Kalshi sweep complete: {total} political events written.")
+    else:
+        print(f"Kalshi sweep stopped early after {total} events; the next run will resume.")
+
 def get_kalshi_info():
     connection = main.create_connection()
 
     if connection:
-        events = fetch_kalshi_events()
-        insert_event_data(connection, events)
+        sweep_kalshi_events(connection)
         connection.close()
     else:
         print("Failed to connect to the database.")
-
-
-
@@ -1,34 +1,31 @@
 import requests
-import requests_cache
-import mysql.connector
-from mysql.connector import Error
+import http_client
+from fast_decode import loads
 from datetime import datetime
 from tqdm import tqdm
 import hashlib
 import main
 
 def fetch_kalshi_events():
-    session = requests_cache.CachedSession('requests_cache')
     limit = 200
     events = []
     cursor = None
 
     print("Fetching events from Kalshi API...")
     url = "https://api.elections.kalshi.com/trade-api/v2/events"
-    headers = {"accept": "application/json"}
 
     while True:
         params = {"limit": limit, "with_nested_markets": True, "status": "open"}
         if cursor:
             params["cursor"] = cursor
 
-        response = session.get(url, headers=headers, params=params)
+        response = http_client.get(url, params=params)
 
         if response.status_code != 200:
             print(f"Failed to fetch data: {response.status_code} - {response.text}")
             break
 
-        r = response.json()
+        r = loads(response.content)
         batch = r.get("events", [])
         political_events = [event for event in batch if event.get("category") in ["Politics", "World", "Economics"]]
         events.extend(political_events)
@@ -44,7 +41,7 @@ def fetch_kalshi_events():
 events = fetch_kalshi_events()
 
 for event in events:
-    print(f"Event Title: {event.get("title")}")
+    print(f"Event Title: {event.get('title')}")
     for market in event.get('markets'):
         print(f"title: {market.get('title')}")
         print(f"subtitle: {market.get('subtitle')}")
@@ -1,33 +1,15 @@
-import os
-from dotenv import load_dotenv
-import mysql.connector
-from mysql.connector import Error
+import storage
+from storage import Error
 from datetime import datetime
+from pair_catalog import create_pair_catalog_tables, bump_pair_catalog_version
+from migrations import run_migrations
+from bulk_load import BULK_LOAD
+from prepared_statements import fetch_one
 
-load_dotenv()
 
 #establish connection
-def create_connection():
-    connection = None
-    try:
-        print(f"Attempting to connect to:")
-        print(f"Host: {os.getenv('DB_HOST')}")
-        print(f"User: {os.getenv('DB_USER')}")
-        print(f"Database: {os.getenv('DB_NAME')}")
-        
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASS'),
-            database=os.getenv('DB_NAME')
-        )
-        print("Successfully connected to the database")
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        print(f"Error Code: {e.errno}")
-        print(f"SQL State: {e.sqlstate}")
-        print(f"Error Message: {e.msg}")
-    return connection
+def create_connection(allow_local_infile=BULK_LOAD):
+    return storage.create_connection(allow_local_infile=allow_local_infile)
 
 """ *** bet_description table *** """
 
@@ -77,19 +59,6 @@ def add_bet_description(connection):
     except Error as e:
         print(f"Error adding bet: {e}")
 
-def add_bet_url_column(connection):
-    alter_table_query = """
-    ALTER TABLE bet_description
-    ADD COLUMN bet_url VARCHAR(255)
-    """
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute(alter_table_query)
-            connection.commit()
-            print("Column 'bet_url' added successfully.")
-    except Error as e:
-        print(f"Error adding column: {e}")
-
 # view a bet from the bet_description table
 def view_bet_description(connection):
     query = "SELECT * FROM bet_description"
@@ -167,7 +136,7 @@ def manage_bet_description(connection):
     print("3. Update Bet Description")
     print("4. Delete Bet Description")
     print("5. check url")
-    print("6. add url")
+    print("6. Run schema migrations")
     action = input("Enter your choice (1-4): ")
 
     if action == '1':
@@ -181,7 +150,7 @@ def manage_bet_description(connection):
     elif action == '5':
         check_table_schema(connection)
     elif action == '6':
-        add_bet_url_column(connection)
+        run_migrations(connection)
     else:
         print("Invalid choice. Please try again.")
 
@@ -194,6 +163,7 @@ def create_bet_choice_table(connection):
         bet_id INT,
         name VARCHAR(255) NOT NULL,
         outcome ENUM('pending', 'win', 'lose') NOT NULL,
+        ticker VARCHAR(100),  -- Venue market ticker (Kalshi), used for targeted price refreshes
         FOREIGN KEY (bet_id) REFERENCES bet_description(bet_id))
     """
     try:
@@ -434,99 +404,52 @@ def create_arbitrage_opportunities_table(connection):
     except Error as e:
         print(f"Error creating table: {e}")
 
-def add_columns_to_arbitrage_table(connection):
-    columns_to_add = [
-        ("bet_description_1", "VARCHAR(255)"),
-        ("bet_description_2", "VARCHAR(255)"),
-        ("website_1", "VARCHAR(255)"),
-        ("website_2", "VARCHAR(255)"),
-        ("bet_side_1", "VARCHAR(10)"),
-        ("bet_side_2", "VARCHAR(10)"),
-        ("price_yes_1", "DECIMAL(10, 2)"),
-        ("price_no_2", "DECIMAL(10, 2)"),
-        ("bet_amount_1", "DECIMAL(10, 2)"),
-        ("bet_amount_2", "DECIMAL(10, 2)")
-    ]
+# Opportunities refreshed per UPDATE statement in populate_arbitrage_opportunities
+POPULATE_CHUNK_SIZE = 5000
 
+def populate_arbitrage_opportunities(connection, chunk_size=POPULATE_CHUNK_SIZE):
+    """
+    Refresh the denormalized description, website and bet side columns of
+    arbitrage_opportunities from bet_description and arbitrage_bet_sides.
+    New opportunities are written with these filled in, so this is only a backfill:
+    one UPDATE ... JOIN per arb_id range of chunk_size, each committed on its own.
+    """
+    update_query = """
+    UPDATE arbitrage_opportunities ao
+    LEFT JOIN 
+        bet_description bd1 ON ao.bet_id1 = bd1.bet_id
+    LEFT JOIN 
+        bet_description bd2 ON ao.bet_id2 = bd2.bet_id
+    LEFT JOIN 
+        arbitrage_bet_sides sides ON ao.arb_id = sides.arb_id
+    SET 
+        ao.bet_description_1 = bd1.name,
+        ao.bet_description_2 = bd2.name,
+        ao.website_1 = bd1.website,
+        ao.website_2 = bd2.website,
+        ao.bet_side_1 = sides.bet_side_1,
+        ao.bet_side_2 = sides.bet_side_2
+    WHERE 
+        ao.arb_id BETWEEN %s AND %s
+    """
     try:
         with connection.cursor() as cursor:
-            for column_name, column_type in columns_to_add:
-                # Check if the column exists
-                cursor.execute(f"""
-                    SELECT COUNT(*)
-                    FROM information_schema.columns 
-                    WHERE table_name = 'arbitrage_opportunities'
-                    AND column_name = '{column_name}';
-                """)
-                exists = cursor.fetchone()[0]
-
-                if not exists:
-                    # Add the column if it does not exist
-                    alter_query = f"ALTER TABLE arbitrage_opportunities ADD COLUMN {column_name} {column_type};"
-                    cursor.execute(alter_query)
+            cursor.execute("SELECT MIN(arb_id), MAX(arb_id) FROM arbitrage_opportunities")
+            min_id, max_id = cursor.fetchone()
+            if min_id is None:
+                print("No arbitrage opportunities to update.")
+                return
 
-            connection.commit()
-            print("Missing columns added successfully.")
-    except Exception as e:
-        print(f"Error adding columns: {e}")
+            updated = 0
+            for chunk_start in range(min_id, max_id + 1, chunk_size):
+                cursor.execute(update_query, (chunk_start, chunk_start + chunk_size - 1))
+                updated += cursor.rowcount
+                connection.commit()
 
-def populate_arbitrage_opportunities(connection):
-    try:
-        # SQL Query to Fetch Required Data
-        query = """
-        SELECT 
-            ao.arb_id,
-            bd1.name AS bet_description_1,
-            bd2.name AS bet_description_2,
-            bd1.website AS website_1,
-            bd2.website AS website_2,
-            abs.bet_side_1,
-            abs.bet_side_2
-        FROM 
-            arbitrage_opportunities ao
-        LEFT JOIN 
-            bet_description bd1 ON ao.bet_id1 = bd1.bet_id
-        LEFT JOIN 
-            bet_description bd2 ON ao.bet_id2 = bd2.bet_id
-        LEFT JOIN 
-            arbitrage_bet_sides abs ON ao.arb_id = abs.arb_id;
-        """
-
-        # Execute the query and fetch results
-        with connection.cursor(dictionary=True) as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-
-            # Update the arbitrage_opportunities table with fetched data
-            for row in results:
-                update_query = """
-                UPDATE arbitrage_opportunities
-                SET 
-                    bet_description_1 = %s,
-                    bet_description_2 = %s,
-                    website_1 = %s,
-                    website_2 = %s,
-                    bet_side_1 = %s,
-                    bet_side_2 = %s
-                WHERE 
-                    arb_id = %s;
-                """
-                update_values = (
-                    row['bet_description_1'],
-                    row['bet_description_2'],
-                    row['website_1'],
-                    row['website_2'],
-                    row['bet_side_1'],
-                    row['bet_side_2'],
-                    row['arb_id']
-                )
-                cursor.execute(update_query, update_values)
-            
-            # Commit the changes to the database
-            connection.commit()
-            print("arbitrage_opportunities table updated successfully!")
+            print(f"arbitrage_opportunities table updated successfully! ({updated} rows changed)")
 
     except Exception as e:
+        connection.rollback()
         print(f"Error populating arbitrage_opportunities table: {e}")
 
 def add_arbitrage_opportunity(connection):
@@ -689,6 +612,7 @@ def add_similar_event(connection):
         with connection.cursor() as cursor:
             cursor.execute(query, values)
             connection.commit()
+            bump_pair_catalog_version(connection)
             print("Similar event pair added successfully!")
     except Error as e:
         print(f"Error adding similar event pair: {e}")
@@ -763,6 +687,7 @@ def update_bet_id_in_similar_event(connection):
                     cursor.execute(query, values)
                     connection.commit()
                     if cursor.rowcount > 0:
+                        bump_pair_catalog_version(connection)
                         print("Bet ID updated successfully!")
                     else:
                         print("No similar event pair found with the given Event ID.")
@@ -789,6 +714,7 @@ def delete_similar_event(connection):
             cursor.execute(query, (event_id,))
             connection.commit()
             if cursor.rowcount > 0:
+                bump_pair_catalog_version(connection)
                 print(f"Similar event pair with Event ID {event_id} deleted successfully!")
             else:
                 print(f"No similar event pair found with Event ID {event_id}.")
@@ -833,6 +759,7 @@ def create_similar_event_options_table(connection):
         option_id_2 INT NOT NULL,
         option_name_1 VARCHAR(255),
         option_name_2 VARCHAR(255),
+        UNIQUE KEY uq_seo_event_options (event_id, option_id_1, option_id_2),
         FOREIGN KEY (event_id) REFERENCES similar_events(event_id),
         FOREIGN KEY (option_id_1) REFERENCES bet_choice(option_id),
         FOREIGN KEY (option_id_2) REFERENCES bet_choice(option_id)
@@ -871,9 +798,9 @@ def add_similar_event_options(connection):
     option_name_1 = input("Enter the name for the first option: ").strip()
     option_name_2 = input("Enter the name for the second option: ").strip()
 
-    # Insert data into similar_event_options table
+    # Insert data into similar_event_options table; an existing pair is left as it is
     query = """
-    INSERT INTO similar_event_options (event_id, option_id_1, option_id_2, option_name_1, option_name_2)
+    INSERT IGNORE INTO similar_event_options (event_id, option_id_1, option_id_2, option_name_1, option_name_2)
     VALUES (%s, %s, %s, %s, %s);
     """
     values = (event_id, option_id_1, option_id_2, option_name_1, option_name_2)
@@ -881,7 +808,11 @@ def add_similar_event_options(connection):
     try:
         with connection.cursor() as cursor:
             cursor.execute(query, values)
+            if cursor.rowcount == 0:
+                print("These options are already paired for this event.")
+                return
             connection.commit()
+            bump_pair_catalog_version(connection)
             print("Similar event options added successfully!")
     except Error as e:
         print(f"Error adding similar event options: {e}")
@@ -924,6 +855,7 @@ def delete_similar_option_pair(connection):
             cursor.execute(query, (pair_id,))
             connection.commit()
             if cursor.rowcount > 0:
+                bump_pair_catalog_version(connection)
                 print("Similar option pair deleted successfully.")
             else:
                 print("No similar option pair found with the given ID.")
@@ -1033,7 +965,7 @@ def manage_arbitrage_opportunities(connection):
         print("2. View Arbitrage Opportunities")
         print("3. Update an Arbitrage Opportunity")
         print("4. Delete an Arbitrage Opportunity")
-        print("5. Add missing columns")
+        print("5. Run schema migrations")
         print("6. Populate arbitrage opportunites")
         print("7. Go Back to Main Menu")
         
@@ -1048,7 +980,7 @@ def manage_arbitrage_opportunities(connection):
         elif choice == '4':
             delete_arbitrage_opportunity(connection)
         elif choice == '5':
-            add_columns_to_arbitrage_table(connection)
+            run_migrations(connection)
         elif choice == '6':
             populate_arbitrage_opportunities(connection)
         elif choice == '7':
@@ -1131,15 +1063,11 @@ def bet_exists(connection, bet_id):
     - True if the bet exists, False otherwise
     """
     try:
-        cursor = connection.cursor()
         query = "SELECT 1 FROM bet_description WHERE bet_id = %s LIMIT 1"
-        cursor.execute(query, (bet_id,))
-        return cursor.fetchone() is not None  # Returns True if record exists
+        return fetch_one(connection, query, (bet_id,)) is not None  # Returns True if record exists
     except Error as e:
         print(f"Error checking for existing event: {e}")
         return False
-    finally:
-        cursor.close()
 
 def option_exists(connection, option_id):
     """
@@ -1148,15 +1076,11 @@ def option_exists(connection, option_id):
     - True if the option exists, False otherwise
     """
     try:
-        cursor = connection.cursor()
         query = "SELECT 1 FROM bet_choice WHERE option_id = %s LIMIT 1"
-        cursor.execute(query, (option_id,))
-        return cursor.fetchone() is not None  # Returns True if record exists
+        return fetch_one(connection, query, (option_id,)) is not None  # Returns True if record exists
     except Error as e:
         print(f"Error checking for existing event: {e}")
         return False
-    finally:
-        cursor.close()
 
 def price_exists(connection, option_id):
     """
@@ -1165,15 +1089,11 @@ def price_exists(connection, option_id):
     - True if the price exists, False otherwise
     """
     try:
-        cursor = connection.cursor()
         query = "SELECT 1 FROM price WHERE option_id = %s LIMIT 1"
-        cursor.execute(query, (option_id,))
-        return cursor.fetchone() is not None  # Returns True if record exists
+        return fetch_one(connection, query, (option_id,)) is not None  # Returns True if record exists
     except Error as e:
         print(f"Error checking for existing event: {e}")
         return False
-    finally:
-        cursor.close()
 
 """ *** main *** """
 
@@ -1191,6 +1111,8 @@ def main():
             create_similar_events_table(connection)
             create_similar_event_options_table(connection)
             create_arbitrage_bet_sides_table(connection)
+            create_pair_catalog_tables(connection)
+            run_migrations(connection)
             join_bet_data(connection)
 
             main_menu(connection)
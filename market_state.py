@@ -0,0 +1,173 @@
+import threading
+import time
+from array import array
+from pair_catalog import fee_model_for
+import event_bus
+
+# In-memory market state.
+# The latest quote of every option the ingesters have seen in this process, so the
+# arbitrage calculator can price a pair without a query per option. Each field is a
+# column in a typed array indexed by a slot number. option_id is mapped to its slot
+# by an open-addressing hash table that is itself an array, rather than a dict whose
+# keys and values are each a Python int object, so an option costs about 50 bytes
+# and a million options fit in about 50 MB.
+# Websites and fee models are stored as one-byte codes into a list of names.
+#
+# Only this process's writes show up here; anything not in the store is read from
+# the database instead (see get_prices_by_option_id).
+#
+# Ingesters call record_quotes(), which also publishes the options whose price moved
+# as a QUOTES_UPDATED event (see arbitrage_worker).
+
+MISSING = float("nan")
+
+# Marks an unused entry of the hash table
+EMPTY = -1
+INITIAL_TABLE_BITS = 10
+
+def table_position(option_id, bits):
+    # Fibonacci hashing: spreads sequential ids over the table, which keeps the probe
+    # runs of linear probing short
+    return ((option_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> (64 - bits)
+
+class MarketStateStore:
+    """
+    Latest yes/no price, volume, website, fee model and update time per option_id.
+    Safe to update from several ingester threads at once.
+    """
+    def __init__(self):
+        self._table_bits = INITIAL_TABLE_BITS
+        self._table = array("i", [EMPTY]) * (1 << INITIAL_TABLE_BITS)
+        self._option_ids = array("q")
+        self._yes_price = array("d")
+        self._no_price = array("d")
+        self._volume = array("d")
+        self._updated_at = array("d")
+        self._website = array("B")
+        self._fee_model = array("B")
+        self._websites = []
+        self._fee_models = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._option_ids)
+
+    def _find(self, option_id):
+        """
+        Return (table position, slot) for option_id; slot is EMPTY if it isn't stored,
+        and the position is then where it would be inserted. Called with the lock held.
+        """
+        table = self._table
+        mask = len(table) - 1
+        position = table_position(option_id, self._table_bits)
+        while True:
+            slot = table[position]
+            if slot == EMPTY or self._option_ids[slot] == option_id:
+                return position, slot
+            position = (position + 1) & mask
+
+    def _grow(self):
+        # Keep the table at most half full; called with the lock held
+        self._table_bits += 1
+        self._table = array("i", [EMPTY]) * (1 << self._table_bits)
+        for slot, option_id in enumerate(self._option_ids):
+            position, _ = self._find(option_id)
+            self._table[position] = slot
+
+    def _code(self, names, name):
+        # Called with the lock held
+        try:
+            return names.index(name)
+        except ValueError:
+            names.append(name)
+            return len(names) - 1
+
+    def update(self, website, prices, updated_at=None):
+        """
+        Record quotes from one website. prices are price rows in price table order:
+        (option_id, timestamp, volume, yes_price, no_price, yes_odds, no_odds).
+        Returns the option_ids that are new or whose yes or no price changed.
+        """
+        changed = []
+        if not prices:
+            return changed
+        website = (website or "").lower()
+        updated_at = updated_at or time.time()
+        with self._lock:
+            website_code = self._code(self._websites, website)
+            fee_model_code = self._code(self._fee_models, fee_model_for(website))
+            for option_id, _, volume, yes_price, no_price, _, _ in prices:
+                option_id = int(option_id)
+                yes_price = MISSING if yes_price is None else float(yes_price)
+                no_price = MISSING if no_price is None else float(no_price)
+                volume = MISSING if volume is None else float(volume)
+
+                position, slot = self._find(option_id)
+                if slot == EMPTY:
+                    self._table[position] = len(self._option_ids)
+                    self._option_ids.append(option_id)
+                    self._yes_price.append(yes_price)
+                    self._no_price.append(no_price)
+                    self._volume.append(volume)
+                    self._updated_at.append(updated_at)
+                    self._website.append(website_code)
+                    self._fee_model.append(fee_model_code)
+                    if 2 * len(self._option_ids) > len(self._table):
+                        self._grow()
+                    changed.append(option_id)
+                else:
+                    if self._yes_price[slot] != yes_price or self._no_price[slot] != no_price:
+                        changed.append(option_id)
+                    self._yes_price[slot] = yes_price
+                    self._no_price[slot] = no_price
+                    self._volume[slot] = volume
+                    self._updated_at[slot] = updated_at
+                    self._website[slot] = website_code
+                    self._fee_model[slot] = fee_model_code
+        return changed
+
+    def get_prices(self, option_id):
+        """
+        Return (yes_price, no_price) for option_id, or None if either isn't known.
+        """
+        with self._lock:
+            _, slot = self._find(option_id)
+            if slot == EMPTY:
+                return None
+            yes_price, no_price = self._yes_price[slot], self._no_price[slot]
+        # NaN is the only value not equal to itself
+        if yes_price != yes_price or no_price != no_price:
+            return None
+        return yes_price, no_price
+
+    def get(self, option_id):
+        """
+        Return everything known about option_id as a dict, or None.
+        """
+        with self._lock:
+            _, slot = self._find(option_id)
+            if slot == EMPTY:
+                return None
+            state = {
+                "yes_price": self._yes_price[slot],
+                "no_price": self._no_price[slot],
+                "volume": self._volume[slot],
+                "website": self._websites[self._website[slot]],
+                "fee_model": self._fee_models[self._fee_model[slot]],
+                "updated_at": self._updated_at[slot],
+            }
+        for field in ("yes_price", "no_price", "volume"):
+            if state[field] != state[field]:
+                state[field] = None
+        return state
+
+market_state = MarketStateStore()
+
+def record_quotes(website, prices):
+    """
+    Update the market state with freshly fetched price rows and publish the options
+    whose price moved.
+    """
+    changed = market_state.update(website, prices)
+    if changed:
+        event_bus.publish(event_bus.QUOTES_UPDATED, changed)
@@ -0,0 +1,195 @@
+import time
+from datetime import date, datetime
+from storage import Error
+import main
+from fast_decode import parse_json_list
+from kalshiapi import fetch_kalshi_markets
+from polymarketapi import fetch_polymarket_markets
+from market_state import record_quotes
+
+# Seconds between quote refreshes for each tier
+TIER_INTERVALS = {
+    "hot": 15,
+    "warm": 60,
+    "cold": 300,
+}
+
+# Tier thresholds
+HOT_VOLUME = 100000
+HOT_EXPIRY_DAYS = 2
+COLD_VOLUME = 1000
+COLD_EXPIRY_DAYS = 30
+
+def assign_tier(volume, expiration_date, today=None):
+    """
+    Pick a polling tier for a matched option.
+    - hot: high volume, or expiring within HOT_EXPIRY_DAYS
+    - cold: low volume and more than COLD_EXPIRY_DAYS (or no date) from expiring
+    - warm: everything else
+    """
+    today = today or date.today()
+    days_left = (expiration_date - today).days if expiration_date else None
+    volume = float(volume or 0)
+
+    if volume >= HOT_VOLUME or (days_left is not None and days_left <= HOT_EXPIRY_DAYS):
+        return "hot"
+    if volume < COLD_VOLUME and (days_left is None or days_left > COLD_EXPIRY_DAYS):
+        return "cold"
+    return "warm"
+
+def get_matched_options(connection):
+    """
+    Fetch every open option referenced by similar_event_options, with what is
+    needed to poll and tier it.
+    Returns a list of (option_id, ticker, website, expiration_date, volume) tuples.
+    """
+    query = """
+    SELECT
+        bc.option_id,
+        bc.ticker,
+        bd.website,
+        bd.expiration_date,
+        COALESCE(
+            (SELECT p.volume FROM price p
+             WHERE p.option_id = bc.option_id
+             ORDER BY p.timestamp DESC LIMIT 1),
+            -- Quotes older than the raw retention only survive as bars
+            (SELECT b.volume FROM price_1m b
+             WHERE b.option_id = bc.option_id
+             ORDER BY b.bucket DESC LIMIT 1),
+            (SELECT b.volume FROM price_1h b
+             WHERE b.option_id = bc.option_id
+             ORDER BY b.bucket DESC LIMIT 1)
+        ) AS volume
+    FROM
+        bet_choice bc
+    JOIN
+        bet_description bd ON bc.bet_id = bd.bet_id
+    WHERE
+        bd.status = 'open'
+        AND bc.option_id IN (
+            SELECT option_id_1 FROM similar_event_options
+            UNION
+            SELECT option_id_2 FROM similar_event_options
+        )
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            return cursor.fetchall()
+    except Error as e:
+        print(f"Error fetching matched options: {e}")
+        return []
+
+def write_prices(connection, prices):
+    price_query = """
+    INSERT INTO price (option_id, timestamp, volume, yes_price, no_price, yes_odds, no_odds)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        volume=VALUES(volume),
+        yes_price=VALUES(yes_price),
+        no_price=VALUES(no_price),
+        yes_odds=VALUES(yes_odds),
+        no_odds=VALUES(no_odds)
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.executemany(price_query, prices)
+            connection.commit()
+    except Error as e:
+        print(f"Error inserting prices: {e}")
+
+class TieredPoller:
+    """
+    Refreshes quotes for matched markets only, each on its tier's interval, using the
+    batched per-market endpoints of each venue. The full catalog sweeps can then run
+    on a slow cadence: a few batched requests per tick replace re-downloading every
+    open event just to update the handful of markets arbitrage looks at.
+    """
+    def __init__(self, refresh_interval=600):
+        self.refresh_interval = refresh_interval
+        self.options = {}
+        self._next_refresh = 0
+
+    def refresh_options(self, connection):
+        """
+        Reload the matched option set and re-tier it. Options that were already being
+        tracked keep their next due time.
+        """
+        now = time.monotonic()
+        options = {}
+        for option_id, ticker, website, expiration_date, volume in get_matched_options(connection):
+            previous = self.options.get(option_id)
+            options[option_id] = {
+                "ticker": ticker,
+                "website": (website or "").lower(),
+                "tier": assign_tier(volume, expiration_date),
+                "next_due": previous["next_due"] if previous else now,
+            }
+        self.options = options
+
+        counts = {tier: 0 for tier in TIER_INTERVALS}
+        for option in options.values():
+            counts[option["tier"]] += 1
+        print(f"Tracking {len(options)} matched options: {counts}")
+
+    def poll_due(self):
+        """
+        Fetch and store fresh quotes for every tracked option whose tier interval has elapsed.
+        """
+        connection = main.create_connection()
+        if connection is None:
+            print("Failed to connect to the database.")
+            return
+
+        try:
+            now = time.monotonic()
+            if now >= self._next_refresh:
+                self.refresh_options(connection)
+                self._next_refresh = now + self.refresh_interval
+
+            due = [option_id for option_id, option in self.options.items() if option["next_due"] <= now]
+            if not due:
+                return
+
+            polymarket_ids = [option_id for option_id in due if self.options[option_id]["website"] == "polymarket"]
+            kalshi_tickers = {
+                self.options[option_id]["ticker"]: option_id
+                for option_id in due
+                if self.options[option_id]["website"] == "kalshi" and self.options[option_id]["ticker"]
+            }
+
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            polymarket_prices = []
+            kalshi_prices = []
+
+            if polymarket_ids:
+                for market in fetch_polymarket_markets(polymarket_ids):
+                    outcome_prices = parse_json_list(market.get("outcomePrices"))
+                    if len(outcome_prices) >= 2:
+                        yes_price = float(outcome_prices[0]) * 100
+                        no_price = float(outcome_prices[1]) * 100
+                        polymarket_prices.append((int(market["id"]), timestamp, market.get("volume"), yes_price, no_price, yes_price, no_price))
+
+            if kalshi_tickers:
+                for market in fetch_kalshi_markets(list(kalshi_tickers)):
+                    option_id = kalshi_tickers.get(market.get("ticker"))
+                    if option_id is None:
+                        continue
+                    yes_price = market.get("yes_bid", 0)
+                    no_price = market.get("no_bid", 0)
+                    kalshi_prices.append((option_id, timestamp, market.get("volume", 0), yes_price, no_price, yes_price, no_price))
+
+            prices = polymarket_prices + kalshi_prices
+            if prices:
+                write_prices(connection, prices)
+            record_quotes("polymarket", polymarket_prices)
+            record_quotes("kalshi", kalshi_prices)
+
+            for option_id in due:
+                option = self.options[option_id]
+                option["next_due"] = now + TIER_INTERVALS[option["tier"]]
+
+            print(f"Refreshed {len(prices)} quotes for {len(due)} due matched options.")
+        finally:
+            connection.close()
@@ -0,0 +1,229 @@
+import sys
+from storage import Error, is_embedded
+from price_retention import BAR_TABLES, create_bar_tables
+from arbitrage_archive import create_archive_tables
+
+# Versioned schema migrations.
+# Each migration runs once, in order, and is recorded in schema_migrations. Steps are
+# written to be safe on databases where the change was already made by hand (e.g.
+# through the old add_bet_url_column / add_columns_to_arbitrage_table menu options).
+#
+#   python migrations.py           apply pending migrations
+#   python migrations.py --check   EXPLAIN the hot queries, exit 1 if any does a full scan
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, index))
+    return cursor.fetchone()[0] > 0
+
+def add_columns(table, columns):
+    def migrate(cursor):
+        for column_name, column_type in columns:
+            if not column_exists(cursor, table, column_name):
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column_name} {column_type}")
+    return migrate
+
+def add_indexes(indexes):
+    def migrate(cursor):
+        for table, index_name, columns in indexes:
+            if not index_exists(cursor, table, index_name):
+                cursor.execute(f"CREATE INDEX {index_name} ON {table} ({', '.join(columns)})")
+    return migrate
+
+def dedupe_similar_event_options(cursor):
+    # Earlier matcher runs inserted every matched pair again; keep the first copy
+    # of each so the unique key can be added
+    cursor.execute("""
+        DELETE seo FROM similar_event_options seo
+        JOIN similar_event_options kept
+            ON kept.event_id = seo.event_id
+            AND kept.option_id_1 = seo.option_id_1
+            AND kept.option_id_2 = seo.option_id_2
+            AND kept.id < seo.id
+    """)
+    if not index_exists(cursor, "similar_event_options", "uq_seo_event_options"):
+        cursor.execute("""
+            ALTER TABLE similar_event_options
+            ADD UNIQUE KEY uq_seo_event_options (event_id, option_id_1, option_id_2)
+        """)
+
+def add_bar_source_times(cursor):
+    for table in BAR_TABLES:
+        add_columns(table, [("first_at", "DATETIME"), ("last_at", "DATETIME")])(cursor)
+
+# (version, description, step)
+MIGRATIONS = [
+    (1, "bet_description.bet_url", add_columns("bet_description", [
+        ("bet_url", "VARCHAR(255)"),
+    ])),
+    (2, "denormalized arbitrage_opportunities columns", add_columns("arbitrage_opportunities", [
+        ("option_id_1", "INT"),
+        ("option_id_2", "INT"),
+        ("option_name_1", "VARCHAR(255)"),
+        ("option_name_2", "VARCHAR(255)"),
+        ("bet_description_1", "VARCHAR(255)"),
+        ("bet_description_2", "VARCHAR(255)"),
+        ("website_1", "VARCHAR(255)"),
+        ("website_2", "VARCHAR(255)"),
+        ("bet_side_1", "VARCHAR(10)"),
+        ("bet_side_2", "VARCHAR(10)"),
+        ("price_yes_1", "DECIMAL(10, 2)"),
+        ("price_no_2", "DECIMAL(10, 2)"),
+        ("bet_amount_1", "DECIMAL(10, 2)"),
+        ("bet_amount_2", "DECIMAL(10, 2)"),
+    ])),
+    (3, "bet_choice.ticker", add_columns("bet_choice", [
+        ("ticker", "VARCHAR(100)"),
+    ])),
+    (4, "indexes for hot lookups", add_indexes([
+        ("similar_event_options", "idx_seo_options", ["option_id_1", "option_id_2"]),
+        ("bet_description", "idx_bd_name_expiration", ["name", "expiration_date"]),
+        ("bet_description", "idx_bd_status_expiration", ["status", "expiration_date"]),
+        ("bet_choice", "idx_bc_bet_name", ["bet_id", "name"]),
+        ("bet_choice", "idx_bc_ticker", ["ticker"]),
+        ("arbitrage_opportunities", "idx_ao_timestamp", ["timestamp"]),
+    ])),
+    (5, "price.timestamp index for retention windows", add_indexes([
+        ("price", "idx_price_timestamp", ["timestamp"]),
+    ])),
+    (6, "unique similar_event_options pairs", dedupe_similar_event_options),
+    (7, "price_1m / price_1h rollup tables", create_bar_tables),
+    # Columns added to arbitrage_opportunities / arbitrage_bet_sides from here on must
+    # be added to their _archive tables in the same migration
+    (8, "arbitrage archive tables", create_archive_tables),
+    (9, "first/last source times on price bars", add_bar_source_times),
+    (10, "arbitrage_opportunities option pair index", add_indexes([
+        ("arbitrage_opportunities", "idx_ao_options", ["option_id_1", "option_id_2"]),
+    ])),
+]
+
+def create_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255),
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def run_migrations(connection):
+    """
+    Apply every migration that hasn't been recorded in schema_migrations yet.
+    Stops at the first failure so later migrations never run on a half-migrated schema.
+    Returns True if the schema is up to date.
+    The embedded backend creates its schema at the latest version (see storage), so
+    there migrations are only recorded.
+    """
+    try:
+        with connection.cursor() as cursor:
+            create_migrations_table(cursor)
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+
+            for version, description, migrate in MIGRATIONS:
+                if version in applied:
+                    continue
+                if not is_embedded(connection):
+                    print(f"Applying migration {version}: {description}")
+                    migrate(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                connection.commit()
+        return True
+    except Error as e:
+        connection.rollback()
+        print(f"Error applying migrations: {e}")
+        return False
+
+# Queries that run for every market, pair or page. Each must be able to use an index.
+HOT_QUERIES = [
+    ("latest price for an option", """
+        SELECT p.yes_price, p.no_price FROM price p
+        WHERE p.option_id = %s ORDER BY p.timestamp DESC LIMIT 1
+    """, (0,)),
+    ("similar_event_options by option pair", """
+        SELECT option_name_1, option_name_2 FROM similar_event_options
+        WHERE option_id_1 = %s AND option_id_2 = %s
+    """, (0, 0)),
+    ("bet_description by name and expiration", """
+        SELECT bet_id FROM bet_description WHERE name = %s AND expiration_date = %s
+    """, ("", "2000-01-01")),
+    ("bet_choice by bet and name", """
+        SELECT option_id FROM bet_choice WHERE bet_id = %s AND name = %s
+    """, (0, "")),
+    ("expired open events", """
+        SELECT bet_id FROM bet_description
+        WHERE status = 'open' AND expiration_date < CURDATE() LIMIT 1000
+    """, ()),
+    ("price retention window", """
+        SELECT option_id FROM price WHERE timestamp >= %s AND timestamp < %s
+    """, ("2000-01-01", "2000-01-01 00:15:00")),
+    ("arbitrage_opportunities by age", """
+        SELECT arb_id FROM arbitrage_opportunities WHERE timestamp < %s LIMIT 1000
+    """, ("2000-01-01",)),
+    ("latest arbitrage_opportunity for an option pair", """
+        SELECT arb_id, profit, bet_side_1, bet_side_2 FROM arbitrage_opportunities
+        WHERE option_id_1 = %s AND option_id_2 = %s ORDER BY arb_id DESC LIMIT 1
+    """, (0, 0)),
+]
+
+# (hot query name, table) pairs allowed to be read with a full scan, e.g. a table that
+# stays small enough that the optimizer rightly prefers scanning it
+FULL_SCAN_ALLOWED = set()
+
+def check_hot_queries(connection):
+    """
+    EXPLAIN each hot query. A query fails the check when some table in its plan is read
+    with a full scan (type ALL), whether or not an index was available, unless the
+    pair is listed in FULL_SCAN_ALLOWED.
+    Returns True if every query passed.
+    """
+    if is_embedded(connection):
+        print("Hot query check only applies to MySQL.")
+        return True
+    ok = True
+    with connection.cursor(dictionary=True) as cursor:
+        for name, query, params in HOT_QUERIES:
+            cursor.execute("EXPLAIN " + query, params)
+            for row in cursor.fetchall():
+                if row.get("type") != "ALL":
+                    continue
+                table = row.get("table")
+                if (name, table) in FULL_SCAN_ALLOWED:
+                    print(f"[allowed] {name}: full scan of {table}")
+                elif row.get("possible_keys"):
+                    print(f"[FAIL] {name}: full scan of {table} although {row['possible_keys']} could be used")
+                    ok = False
+                else:
+                    print(f"[FAIL] {name}: full scan of {table} with no usable index")
+                    ok = False
+    print("Hot query check passed." if ok else "Hot query check failed.")
+    return ok
+
+if __name__ == "__main__":
+    import main
+
+    connection = main.create_connection()
+    if connection is None:
+        sys.exit(1)
+    try:
+        if "--check" in sys.argv:
+            passed = check_hot_queries(connection)
+        else:
+            passed = run_migrations(connection)
+    finally:
+        connection.close()
+    sys.exit(0 if passed else 1)
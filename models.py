@@ -0,0 +1,103 @@
+from sqlalchemy import create_engine, Column, Integer, String, Date, Enum, Numeric, ForeignKey, DateTime
+from sqlalchemy import Float
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+import storage
+
+# Database Setup
+# The engine is created on first use so that importing the models (e.g. from a
+# batch script) doesn't open a connection pool or touch the database. The backend
+# (MySQL or the embedded SQLite database) is picked by storage.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+Base = declarative_base()
+
+_engine = None
+
+def get_engine():
+    """
+    Return the shared SQLAlchemy engine, creating it (and binding SessionLocal) on first call.
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_engine(storage.database_url(), **storage.engine_options())
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+# SQLAlchemy Models
+class BetDescription(Base):
+    __tablename__ = "bet_description"
+    bet_id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    expiration_date = Column(Date, nullable=True)
+    website = Column(String, nullable=True)
+    bet_url = Column(String, nullable=True)  # New field for bet URL
+    status = Column(Enum("open", "closed", name="status_enum"), nullable=True)
+    is_arbitrage = Column(Enum("yes", "no", name="arbitrage_enum"), nullable=True)
+
+class ArbitrageOpportunities(Base):
+    __tablename__ = "arbitrage_opportunities"
+
+    arb_id = Column(Integer, primary_key=True, index=True)
+    bet_id1 = Column(Integer, nullable=False)
+    bet_id2 = Column(Integer, nullable=False)
+    bet_description_1 = Column(String(255), nullable=True)  # Match the database column type
+    bet_description_2 = Column(String(255), nullable=True)
+    website_1 = Column(String(255), nullable=True)
+    website_2 = Column(String(255), nullable=True)
+    option_name_1 = Column(String(255), nullable=True)
+    option_name_2 = Column(String(255), nullable=True)
+    bet_side_1 = Column(String(10), nullable=True)
+    bet_side_2 = Column(String(10), nullable=True)
+    profit = Column(Float, nullable=True)  # Use Float instead of DECIMAL
+    bet_amount_1 = Column(Float, nullable=True)  # Use Float instead of DECIMAL
+    bet_amount_2 = Column(Float, nullable=True)  # Use Float instead of DECIMAL
+    timestamp = Column(DateTime, nullable=True)
+
+class SimilarEventOptions(Base):
+    __tablename__ = 'similar_event_options'
+    event_id = Column(Integer, primary_key=True, index=True)
+    option_id_1 = Column(Integer)
+    option_id_2 = Column(Integer)
+    option_name_1 = Column(String(255))
+    option_name_2 = Column(String(255))
+
+class SimilarEvents(Base):
+    __tablename__ = 'similar_events'
+    event_id = Column(Integer, primary_key=True, index=True)
+    bet_id_1 = Column(Integer)
+    description_1 = Column(String(255))
+    website_1 = Column(String(255))
+    bet_id_2 = Column(Integer)
+    description_2 = Column(String(255))
+    website_2 = Column(String(255))
+
+class BetSides(Base):
+    __tablename__ = 'arbitrage_bet_sides'
+    arb_id = Column(Integer, ForeignKey('arbitrage_opportunities.arb_id'), primary_key=True)
+    bet_side_1 = Column(String(10), nullable=False)
+    bet_side_2 = Column(String(10), nullable=False)
+
+# Additional SQLAlchemy Model for Price Table
+class Price(Base):
+    __tablename__ = 'price'
+    option_id = Column(Integer, ForeignKey('bet_choice.option_id'), primary_key=True, index=True)
+    timestamp = Column(Date, primary_key=True)
+    volume = Column(Numeric, nullable=True)
+    yes_price = Column(Numeric, nullable=True)
+    no_price = Column(Numeric, nullable=True)
+    yes_odds = Column(Numeric, nullable=True)
+    no_odds = Column(Numeric, nullable=True)
+
+def create_tables(engine):
+    """
+    Create the tables owned by the API. `price` is left out because its foreign key
+    points at bet_choice, which is created by main.py rather than mapped here.
+    """
+    tables = [
+        BetDescription.__table__,
+        ArbitrageOpportunities.__table__,
+        SimilarEventOptions.__table__,
+        SimilarEvents.__table__,
+        BetSides.__table__,
+    ]
+    Base.metadata.create_all(bind=engine, tables=tables)
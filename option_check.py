@@ -1,34 +1,6 @@
-import mysql.connector
-from mysql.connector import Error
 from difflib import SequenceMatcher
-from dotenv import load_dotenv
-import os
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Establish connection
-def create_connection():
-    connection = None
-    try:
-        print(f"Attempting to connect to:")
-        print(f"Host: {os.getenv('DB_HOST')}")
-        print(f"User: {os.getenv('DB_USER')}")
-        print(f"Database: {os.getenv('DB_NAME')}")
-        
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASS'),
-            database=os.getenv('DB_NAME')
-        )
-        print("Successfully connected to the database")
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        print(f"Error Code: {e.errno}")
-        print(f"SQL State: {e.sqlstate}")
-        print(f"Error Message: {e.msg}")
-    return connection
+from pair_catalog import bump_pair_catalog_version
+from storage import create_connection
 
 # Calculate similarity
 def calculate_similarity(string1, string2):
@@ -43,6 +15,7 @@ def populate_similar_event_options():
 
     cursor = conn.cursor()
 
+    inserted = 0
     try:
         # Step 1: Get all event pairs from the similar_events table
         cursor.execute("SELECT event_id, bet_id_1, bet_id_2 FROM similar_events")
@@ -77,17 +50,22 @@ def populate_similar_event_options():
 
                     if similarity >= 0.3:  # Threshold for similarity
                         print(f"Inserting into similar_event_options: event_id={event_id}, option_id_1={option_1[0]}, option_id_2={option_2[0]}")  # Debugging
+                        # Pairs matched by an earlier run are skipped (unique key on
+                        # event_id, option_id_1, option_id_2), so re-running is safe
                         cursor.execute(
                             """
-                            INSERT INTO similar_event_options (event_id, option_id_1, option_id_2, option_name_1, option_name_2)
+                            INSERT IGNORE INTO similar_event_options (event_id, option_id_1, option_id_2, option_name_1, option_name_2)
                             VALUES (%s, %s, %s, %s, %s)
                             """,
                             (event_id, option_1[0], option_2[0], option_1[1], option_2[1])
                         )
+                        inserted += cursor.rowcount
 
         # Commit changes to the database
         conn.commit()
-        print("Similar event options have been successfully filtered and populated.")
+        if inserted:
+            bump_pair_catalog_version(conn)
+        print(f"Similar event options have been successfully filtered and populated ({inserted} new pairs).")
 
     except Exception as e:
         print(f"Error: {e}")
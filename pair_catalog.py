@@ -0,0 +1,165 @@
+import threading
+from storage import Error
+
+# Materialized pair catalog.
+# Everything needed to evaluate a similar option pair (option ids, bet ids, names,
+# websites and fee models) is built with one join into the pair_catalog table and
+# cached in memory. Anything that changes similar_events or similar_event_options
+# (the matcher and the menus in main.py) calls bump_pair_catalog_version(), and the
+# catalog is only rebuilt when its version is behind.
+
+# Fee model per website; anything not listed has no fee
+FEE_MODELS = {
+    "kalshi": "kalshi",
+}
+
+def fee_model_for(website):
+    return FEE_MODELS.get((website or "").lower(), "none")
+
+def create_pair_catalog_tables(connection):
+    create_catalog_query = """
+    CREATE TABLE IF NOT EXISTS pair_catalog (
+        pair_id INT PRIMARY KEY,
+        event_id INT NOT NULL,
+        option_id_1 INT NOT NULL,
+        option_id_2 INT NOT NULL,
+        bet_id_1 INT NOT NULL,
+        bet_id_2 INT NOT NULL,
+        option_name_1 VARCHAR(255),
+        option_name_2 VARCHAR(255),
+        website_1 VARCHAR(255),
+        website_2 VARCHAR(255),
+        fee_model_1 VARCHAR(20),
+        fee_model_2 VARCHAR(20),
+        version INT NOT NULL
+    )
+    """
+    create_version_query = """
+    CREATE TABLE IF NOT EXISTS pair_catalog_version (
+        id TINYINT PRIMARY KEY,
+        version INT NOT NULL
+    )
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(create_catalog_query)
+            cursor.execute(create_version_query)
+            cursor.execute("INSERT IGNORE INTO pair_catalog_version (id, version) VALUES (1, 1)")
+            connection.commit()
+    except Error as e:
+        print(f"Error creating pair catalog tables: {e}")
+
+def bump_pair_catalog_version(connection):
+    """
+    Mark the pair catalog as out of date. Call after committing a change to
+    similar_events or similar_event_options.
+    """
+    create_pair_catalog_tables(connection)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE pair_catalog_version SET version = version + 1 WHERE id = 1")
+            connection.commit()
+    except Error as e:
+        print(f"Error bumping pair catalog version: {e}")
+
+def get_pair_catalog_version(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT version FROM pair_catalog_version WHERE id = 1")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+def get_built_version(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT MAX(version) FROM pair_catalog")
+        row = cursor.fetchone()
+        return row[0] if row and row[0] is not None else None
+
+def rebuild_pair_catalog(connection, version):
+    """
+    Rebuild the pair_catalog table from the pair tables with a single join.
+    Each (event_id, option_id_1, option_id_2) pair is taken once, from its lowest id,
+    in case the table still holds duplicates from before its unique key.
+    """
+    select_query = """
+    SELECT
+        seo.id,
+        seo.event_id,
+        seo.option_id_1,
+        seo.option_id_2,
+        bc1.bet_id,
+        bc2.bet_id,
+        seo.option_name_1,
+        seo.option_name_2,
+        se.website_1,
+        se.website_2
+    FROM
+        similar_event_options seo
+    JOIN (
+        SELECT MIN(id) AS id
+        FROM similar_event_options
+        GROUP BY event_id, option_id_1, option_id_2
+    ) first_pair ON first_pair.id = seo.id
+    JOIN similar_events se ON se.event_id = seo.event_id
+    JOIN bet_choice bc1 ON bc1.option_id = seo.option_id_1
+    JOIN bet_choice bc2 ON bc2.option_id = seo.option_id_2
+    """
+    insert_query = """
+    INSERT INTO pair_catalog (
+        pair_id, event_id, option_id_1, option_id_2, bet_id_1, bet_id_2,
+        option_name_1, option_name_2, website_1, website_2, fee_model_1, fee_model_2, version
+    )
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(select_query)
+        rows = [
+            row + (fee_model_for(row[8]), fee_model_for(row[9]), version)
+            for row in cursor.fetchall()
+        ]
+        cursor.execute("DELETE FROM pair_catalog")
+        if rows:
+            cursor.executemany(insert_query, rows)
+        connection.commit()
+    print(f"Rebuilt pair catalog (version {version}) with {len(rows)} pairs.")
+
+def load_pair_catalog(connection):
+    with connection.cursor(dictionary=True) as cursor:
+        cursor.execute("SELECT * FROM pair_catalog")
+        return cursor.fetchall()
+
+class PairCatalog:
+    """
+    In-memory copy of pair_catalog. get() costs one single-row version query while the
+    catalog is current; when the version has moved on it reloads the table, rebuilding
+    it first if no process has done so yet.
+    """
+    def __init__(self):
+        self.version = None
+        self.pairs = []
+        self._tables_ready = False
+        self._lock = threading.Lock()
+
+    def get(self, connection):
+        """
+        Return the catalog as a list of dicts, one per similar option pair.
+        """
+        with self._lock:
+            try:
+                if not self._tables_ready:
+                    create_pair_catalog_tables(connection)
+                    self._tables_ready = True
+
+                version = get_pair_catalog_version(connection)
+                if version == self.version:
+                    return self.pairs
+
+                if get_built_version(connection) != version:
+                    rebuild_pair_catalog(connection, version)
+                self.pairs = load_pair_catalog(connection)
+                self.version = version
+            except Error as e:
+                connection.rollback()
+                print(f"Error loading pair catalog: {e}")
+            return self.pairs
+
+pair_catalog = PairCatalog()
@@ -0,0 +1,240 @@
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from storage import Error
+
+# Columnar export for analytics.
+# Streams price, bet_choice and bet_description out of the database into Parquet files
+# under EXPORT_DIR, laid out with Hive-style partitions so DuckDB, pandas or pyarrow can
+# query them without touching the OLTP database, e.g. in DuckDB:
+#
+#   SELECT * FROM read_parquet('exports/price/**/*.parquet', hive_partitioning = true)
+#
+# price is exported incrementally: each run reads the rows after the last exported
+# timestamp (the watermark) through an unbuffered cursor, fetching BATCH_ROWS at a time,
+# and writes them under price/date=YYYY-MM-DD/website=<site>/. bet_description and
+# bet_choice are small and change in place, so each run rewrites a snapshot partitioned
+# by website.
+#
+#   python parquet_export.py
+
+EXPORT_DIR = "exports"
+WATERMARK_FILE = "_watermarks.json"
+BATCH_ROWS = 50000
+
+# Only rows older than this are exported, so quotes still queued in the write-behind
+# writer (which carry their fetch time) aren't skipped by the watermark
+EXPORT_LAG = timedelta(minutes=5)
+
+PRICE_QUERY = """
+SELECT
+    p.option_id, p.timestamp, p.volume, p.yes_price, p.no_price, p.yes_odds, p.no_odds,
+    bd.website
+FROM price p
+JOIN bet_choice bc ON bc.option_id = p.option_id
+JOIN bet_description bd ON bd.bet_id = bc.bet_id
+WHERE p.timestamp > %s AND p.timestamp <= %s
+ORDER BY p.timestamp
+"""
+
+BET_DESCRIPTION_QUERY = """
+SELECT bet_id, name, expiration_date, website, bet_url, status, is_arbitrage
+FROM bet_description
+"""
+
+BET_CHOICE_QUERY = """
+SELECT bc.option_id, bc.bet_id, bc.name, bc.outcome, bc.ticker, bd.website
+FROM bet_choice bc
+JOIN bet_description bd ON bd.bet_id = bc.bet_id
+"""
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        print("Parquet export needs pyarrow: pip install pyarrow")
+        return None
+    return pyarrow
+
+def load_watermarks(directory):
+    try:
+        with open(os.path.join(directory, WATERMARK_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_watermarks(directory, watermarks):
+    path = os.path.join(directory, WATERMARK_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(watermarks, f)
+    os.replace(tmp_path, path)
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def partition_value(value):
+    return (value or "unknown").lower().replace("/", "_")
+
+def schemas(pa):
+    """
+    Column types per exported table. Spelled out rather than inferred, since a batch
+    where a column is all NULL would otherwise get a null type that doesn't match the
+    other files of the dataset.
+    """
+    return {
+        "price": pa.schema([
+            ("option_id", pa.int64()), ("timestamp", pa.timestamp("s")), ("volume", pa.float64()),
+            ("yes_price", pa.float64()), ("no_price", pa.float64()),
+            ("yes_odds", pa.float64()), ("no_odds", pa.float64()),
+        ]),
+        "bet_description": pa.schema([
+            ("bet_id", pa.int64()), ("name", pa.string()), ("expiration_date", pa.date32()),
+            ("bet_url", pa.string()), ("status", pa.string()), ("is_arbitrage", pa.string()),
+        ]),
+        "bet_choice": pa.schema([
+            ("option_id", pa.int64()), ("bet_id", pa.int64()), ("name", pa.string()),
+            ("outcome", pa.string()), ("ticker", pa.string()),
+        ]),
+    }
+
+def to_column(values):
+    # pyarrow won't convert Decimals into a float column
+    return [float(value) if isinstance(value, Decimal) else value for value in values]
+
+def write_partition(pa, path, schema, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    columns = [to_column(values) for values in zip(*rows)]
+    table = pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+    pa.parquet.write_table(table, path)
+
+def export_price(pa, connection, directory, since, until, written, batch_rows=BATCH_ROWS):
+    """
+    Write prices with since < timestamp <= until, one file per (date, website) per batch.
+    Each path is appended to `written` before its file is written, so a file left
+    half-written by a failure is still cleaned up.
+    """
+    schema = schemas(pa)["price"]
+    run_id = until.strftime("%Y%m%dT%H%M%S")
+    batch_number = 0
+
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(PRICE_QUERY, (since, until))
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            partitions = {}
+            for row in rows:
+                key = (row[1].date().isoformat(), partition_value(row[7]))
+                partitions.setdefault(key, []).append(row[:7])
+            for (day, website), partition_rows in partitions.items():
+                path = os.path.join(directory, "price", f"date={day}", f"website={website}",
+                                    f"part-{run_id}-{batch_number:05d}.parquet")
+                written.append(path)
+                write_partition(pa, path, schema, partition_rows)
+            batch_number += 1
+    finally:
+        cursor.close()
+
+def export_snapshot(pa, connection, directory, name, query, website_index, batch_rows=BATCH_ROWS):
+    """
+    Rewrite the snapshot of a table, partitioned by website. Files are written under a
+    new name and the previous snapshot's files removed afterwards; if writing fails,
+    this run's files are removed instead.
+    """
+    run_id = f"{time.time_ns()}"
+    partitions = {}
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            for row in rows:
+                partitions.setdefault(partition_value(row[website_index]), []).append(
+                    row[:website_index] + row[website_index + 1:]
+                )
+    finally:
+        cursor.close()
+
+    table_dir = os.path.join(directory, name)
+    previous = [
+        os.path.join(root, file)
+        for root, _, files in os.walk(table_dir)
+        for file in files if file.endswith(".parquet")
+    ]
+    schema = schemas(pa)[name]
+    written = []
+    try:
+        for website, rows in partitions.items():
+            path = os.path.join(table_dir, f"website={website}", f"snapshot-{run_id}.parquet")
+            written.append(path)
+            write_partition(pa, path, schema, rows)
+    except Exception:
+        remove_files(written)
+        raise
+    for path in previous:
+        os.remove(path)
+    return sum(len(rows) for rows in partitions.values())
+
+def export_to_parquet(connection, directory=EXPORT_DIR):
+    """
+    Run one export: new prices since the watermark, then fresh snapshots of
+    bet_description and bet_choice. Returns True on success.
+    """
+    pa = require_pyarrow()
+    if pa is None:
+        return False
+
+    os.makedirs(directory, exist_ok=True)
+    watermarks = load_watermarks(directory)
+    since = datetime.fromisoformat(watermarks.get("price", "1970-01-01 00:00:00"))
+    until = (datetime.now() - EXPORT_LAG).replace(microsecond=0)
+
+    written = []
+    try:
+        export_price(pa, connection, directory, since, until, written)
+        watermarks["price"] = until.isoformat(" ")
+        save_watermarks(directory, watermarks)
+        print(f"Exported prices up to {until} into {len(written)} files.")
+
+        count = export_snapshot(pa, connection, directory, "bet_description", BET_DESCRIPTION_QUERY, 3)
+        print(f"Exported {count} bet descriptions.")
+        count = export_snapshot(pa, connection, directory, "bet_choice", BET_CHOICE_QUERY, 5)
+        print(f"Exported {count} bet choices.")
+        return True
+    except (Error, OSError, ValueError, pa.lib.ArrowException) as e:
+        # Remove this run's price files so the retry doesn't export them twice
+        if watermarks.get("price") != until.isoformat(" "):
+            remove_files(written)
+        print(f"Error exporting to Parquet: {e}")
+        return False
+
+def run_parquet_export():
+    import main
+
+    connection = main.create_connection()
+    if connection is None:
+        print("Failed to connect to the database.")
+        return False
+    try:
+        return export_to_parquet(connection)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    sys.exit(0 if run_parquet_export() else 1)
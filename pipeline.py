@@ -0,0 +1,78 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# A stage is a zero-argument callable plus the names of the stages it depends on.
+class Stage:
+    def __init__(self, name, func, depends_on=()):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+
+def _check_graph(stages):
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.depends_on if dep not in names]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s): {missing}")
+
+    # Make sure there is no cycle (Kahn's algorithm)
+    remaining = {stage.name: set(stage.depends_on) for stage in stages}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Dependency cycle between stages: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def run_pipeline(stages, max_workers=None):
+    """
+    Run the stages as a dependency graph. A stage starts as soon as every stage it
+    depends on has finished, so independent stages run in parallel and the total
+    time is the critical path rather than the sum of all stages.
+    If a stage fails, the stages that depend on it (directly or not) are skipped.
+
+    Returns:
+        dict: stage name -> "ok", "failed" or "skipped".
+    """
+    _check_graph(stages)
+    by_name = {stage.name: stage for stage in stages}
+    results = {}
+    running = {}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages)) as executor:
+        while len(results) < len(stages):
+            for stage in stages:
+                if stage.name in results or stage.name in running.values():
+                    continue
+                dep_results = [results.get(dep) for dep in stage.depends_on]
+                if any(r in ("failed", "skipped") for r in dep_results):
+                    results[stage.name] = "skipped"
+                    print(f"[pipeline] Skipping {stage.name}: an upstream stage did not complete.")
+                elif all(r == "ok" for r in dep_results):
+                    print(f"[pipeline] Starting {stage.name}")
+                    running[executor.submit(_timed, stage.func)] = stage.name
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    elapsed = future.result()
+                    results[name] = "ok"
+                    print(f"[pipeline] {name} finished in {elapsed:.2f}s")
+                except Exception as e:
+                    results[name] = "failed"
+                    print(f"[pipeline] {name} failed: {e}")
+
+    print(f"[pipeline] Completed in {time.perf_counter() - start:.2f}s: {results}")
+    return {name: results[name] for name in by_name}
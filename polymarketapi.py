@@ -1,21 +1,29 @@
 import requests
-import ast
+import http_client
+from fast_decode import loads, parse_json_list
 import main
 from datetime import datetime
-from mysql.connector import Error
+from storage import Error
 import threading
+from collections import deque
+from sweep_checkpoint import SweepCheckpoint
+from bulk_load import upsert_rows
+from price_writer import PriceWriter
+from market_state import record_quotes
 
 # Function to process each response and add the data to shared lists
 def process_response(response, political_events, bet_choices, prices, lock):
     # Create a new database connection for each thread
     connection = main.create_connection()
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
     for event in response:
         list_tags = [tag['slug'] for tag in event['tags']]
 
-        if any("politics" in tag for tag in list_tags):
+        if any(is_political_tag(tag) for tag in list_tags):
             bet_id = event['id']
             title = event['title']
+            expiration_date = None
             if 'endDate' in event:
                 end_date = event['endDate'].split('T')
                 expiration_date = end_date[0]
@@ -29,8 +37,7 @@ def process_response(response, political_events, bet_choices, prices, lock):
             for market in event['markets']:
                 market_id = market['id']
                 question = market['question']
-                if 'volume' in market:
-                    volume = market['volume']
+                volume = market.get('volume')
                 
                 if main.option_exists(connection, market_id):
                     print("market exists. updating")
@@ -40,13 +47,7 @@ def process_response(response, political_events, bet_choices, prices, lock):
                 with lock:
                     bet_choices.append((market_id, bet_id, question, "pending"))
 
-                clean_outcomes = ast.literal_eval(market['outcomes'])
-                clean_outcomePrices = []
-                if 'outcomePrices' in market:
-                    try:
-                        clean_outcomePrices = ast.literal_eval(market['outcomePrices'])
-                    except (ValueError, SyntaxError) as e:
-                        print(f"Error: {e}")
+                clean_outcomePrices = parse_json_list(market.get('outcomePrices'))
             
                 if main.price_exists(connection, market_id):
                     print("existing price. updating")
@@ -57,7 +58,7 @@ def process_response(response, political_events, bet_choices, prices, lock):
                     with lock:
                         prices.append((
                             market_id, 
-                            datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 
+                            timestamp, 
                             volume, 
                             float(clean_outcomePrices[0])*100, 
                             float(clean_outcomePrices[1])*100, 
@@ -70,74 +71,259 @@ def process_response(response, political_events, bet_choices, prices, lock):
     connection.close()
 
 
-def getpolymarketinfo():
-    base_url = "https://gamma-api.polymarket.com/events"
-    params = {
-        "closed": "false",
-        "limit": 100,
-        "offset": 0
-    }
+def fetch_polymarket_markets(market_ids, batch_size=50):
+    """
+    Fetch current quotes for specific markets by id, batch_size ids per request.
+    Used for targeted refreshes of matched markets instead of a full catalog sweep.
+    Returns a list of market dicts.
+    """
+    base_url = "https://gamma-api.polymarket.com/markets"
+    markets = []
 
-    political_events = []
-    bet_choices = []
-    prices = []
+    market_ids = list(market_ids)
+    for i in range(0, len(market_ids), batch_size):
+        batch = market_ids[i:i + batch_size]
+        params = [("id", market_id) for market_id in batch]
+        params.append(("limit", len(batch)))
+        try:
+            r = http_client.get(base_url, params=params)
+        except requests.RequestException as e:
+            print(f"Failed to fetch markets: {e}")
+            continue
 
-    lock = threading.Lock()
-    threads = []
+        if r.status_code != 200:
+            print(f"Failed to fetch markets: {r.status_code} - {r.text}")
+            continue
+
+        markets.extend(loads(r.content))
+
+    return markets
+
+
+def insert_polymarket_data(connection, political_events, bet_choices, prices, price_writer=None, on_written=None):
+    """
+    Upsert one batch of events, options and prices. Returns True if it was committed.
+    With a price_writer, the prices are handed to it after the events and options are
+    committed, and it calls on_written once they are stored.
+    """
+    try:
+        if political_events:
+            insert_query = """
+                INSERT INTO bet_description (bet_id, name, expiration_date, website, status, is_arbitrage)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE name=VALUES(name), expiration_date=VALUES(expiration_date),
+                                        website=VALUES(website), status=VALUES(status), is_arbitrage=VALUES(is_arbitrage)
+            """
+            with connection.cursor() as cursor:
+                upsert_rows(cursor, insert_query, "bet_description",
+                            ("bet_id", "name", "expiration_date", "website", "status", "is_arbitrage"),
+                            political_events,
+                            ("name", "expiration_date", "website", "status", "is_arbitrage"))
+
+        if bet_choices:
+            insert_query = """
+                INSERT INTO bet_choice (option_id, bet_id, name, outcome)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE name=VALUES(name), outcome=VALUES(outcome)
+            """
+            with connection.cursor() as cursor:
+                upsert_rows(cursor, insert_query, "bet_choice",
+                            ("option_id", "bet_id", "name", "outcome"),
+                            bet_choices,
+                            ("name", "outcome"))
+
+        if prices and price_writer is None:
+            insert_query = """
+                INSERT INTO price (option_id, timestamp, volume, yes_price, no_price, yes_odds, no_odds)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE timestamp=VALUES(timestamp), volume=VALUES(volume),
+                                        yes_price=VALUES(yes_price), no_price=VALUES(no_price),
+                                        yes_odds=VALUES(yes_odds), no_odds=VALUES(no_odds)
+            """
+            with connection.cursor() as cursor:
+                upsert_rows(cursor, insert_query, "price",
+                            ("option_id", "timestamp", "volume", "yes_price", "no_price", "yes_odds", "no_odds"),
+                            prices,
+                            ("volume", "yes_price", "no_price", "yes_odds", "no_odds"))
+
+        connection.commit()
+    except Error as e:
+        print(f"Error inserting Polymarket data: {e}")
+        connection.rollback()
+        return False
+
+    if price_writer is not None:
+        price_writer.submit(prices, on_written)
+    record_quotes("polymarket", prices)
+    return True
 
+
+PAGE_SIZE = 100
+# Pages fetched ahead of the last written page while earlier ones are still processing
+MAX_PENDING_PAGES = 8
+
+TAGS_URL = "https://gamma-api.polymarket.com/tags"
+TAG_PAGE_SIZE = 500
+
+# Tag ids resolved once per process (the tags endpoint is also served from the HTTP cache)
+_political_tag_ids = None
+
+def is_political_tag(slug):
+    return "politics" in (slug or "")
+
+def get_political_tag_ids():
+    """
+    Resolve the ids of every tag whose slug contains "politics" (the same rule
+    process_response filters on), so the events endpoint can be asked for just those.
+    Returns an empty list if the tags can't be fetched.
+    """
+    global _political_tag_ids
+    if _political_tag_ids is not None:
+        return _political_tag_ids
+
+    tag_ids = set()
+    offset = 0
     while True:
-        r = requests.get(base_url, params=params)
-        response = r.json()
+        try:
+            r = http_client.get(TAGS_URL, params={"limit": TAG_PAGE_SIZE, "offset": offset}, cached=True)
+        except requests.RequestException as e:
+            print(f"Failed to fetch tags: {e}")
+            return []
 
-        if not response:
+        if r.status_code != 200:
+            print(f"Failed to fetch tags: {r.status_code} - {r.text}")
+            return []
+
+        tags = loads(r.content)
+        if not tags:
             break
+        tag_ids.update(tag["id"] for tag in tags if is_political_tag(tag.get("slug")))
+        offset += TAG_PAGE_SIZE
+
+    _political_tag_ids = sorted(tag_ids)
+    print(f"Resolved {len(_political_tag_ids)} political tags.")
+    return _political_tag_ids
 
-        # Start a thread to process this entire response
-        thread = threading.Thread(target=process_response, args=(response, political_events, bet_choices, prices, lock))
-        thread.start()
-        threads.append(thread)
+def getpolymarketinfo():
+    """
+    Sweep the open political events, one tag at a time, by offset. Each page is
+    processed on its own thread while later pages are fetched, and pages are written
+    in order. Quotes go through a write-behind PriceWriter, and a page's position is
+    checkpointed once its quotes are committed, so an interrupted sweep resumes there
+    on the next run. process_response still checks the tags of every
+    event, so anything the server lets through that isn't political is dropped.
+    """
+    base_url = "https://gamma-api.polymarket.com/events"
 
-        params["offset"] += 100
+    # Fall back to sweeping every open event if the tags can't be resolved
+    tag_ids = get_political_tag_ids() or [None]
 
-    # Wait for all threads to finish
-    for thread in threads:
-        thread.join()
+    # The checkpoint names the tag it stopped in rather than its index, since the tag
+    # list can change between runs; if that tag is gone, start the sweep over
+    checkpoint = SweepCheckpoint("polymarket")
+    position = checkpoint.load()
+    start_index, start_offset = 0, 0
+    if position is not None:
+        if isinstance(position, dict) and "tag_id" in position and position["tag_id"] in tag_ids:
+            start_index = tag_ids.index(position["tag_id"])
+            start_offset = position.get("offset", 0)
+        else:
+            print(f"Checkpoint position {position} doesn't match the current tags, starting over.")
+            checkpoint.clear()
 
-    # Insert info into the database after all threads have finished
     connection = main.create_connection()
+    if connection is None:
+        print("Failed to connect to the database.")
+        return
 
-    if political_events:
-        insert_query = """
-            INSERT INTO bet_description (bet_id, name, expiration_date, website, status, is_arbitrage)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE name=VALUES(name), expiration_date=VALUES(expiration_date),
-                                    website=VALUES(website), status=VALUES(status), is_arbitrage=VALUES(is_arbitrage)
-        """
-        with connection.cursor() as cursor:
-            cursor.executemany(insert_query, political_events)
-        connection.commit()
+    lock = threading.Lock()
+    pending = deque()
+    seen_event_ids = set()
+    totals = {"events": 0, "choices": 0, "prices": 0}
+    stopped = False
+    failed = False
+    writer = PriceWriter().start()
 
-    if bet_choices:
-        insert_query = """
-            INSERT INTO bet_choice (option_id, bet_id, name, outcome)
-            VALUES (%s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE name=VALUES(name), outcome=VALUES(outcome)
-        """
-        with connection.cursor() as cursor:
-            cursor.executemany(insert_query, bet_choices)
-        connection.commit()
+    def write_oldest_page():
+        page_id, next_position, thread, page = pending.popleft()
+        thread.join()
 
-    if prices:
-        insert_query = """
-            INSERT INTO price (option_id, timestamp, volume, yes_price, no_price, yes_odds, no_odds)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE timestamp=VALUES(timestamp), volume=VALUES(volume),
-                                    yes_price=VALUES(yes_price), no_price=VALUES(no_price),
-                                    yes_odds=VALUES(yes_odds), no_odds=VALUES(no_odds)
-        """
-        with connection.cursor() as cursor:
-            cursor.executemany(insert_query, prices)
-        connection.commit()
-    
+        def save():
+            totals["prices"] += len(page[2])
+            checkpoint.save(page_id, next_position)
+
+        if writer.failed or not insert_polymarket_data(connection, *page, price_writer=writer, on_written=save):
+            return False
+        totals["events"] += len(page[0])
+        totals["choices"] += len(page[1])
+        return True
+
+    for tag_index in range(start_index, len(tag_ids)):
+        tag_id = tag_ids[tag_index]
+        offset = start_offset if tag_index == start_index else 0
+
+        while True:
+            params = {
+                "closed": "false",
+                "limit": PAGE_SIZE,
+                "offset": offset
+            }
+            if tag_id is not None:
+                params["tag_id"] = tag_id
+
+            try:
+                r = http_client.get(base_url, params=params)
+            except requests.RequestException as e:
+                print(f"Failed to fetch events for tag {tag_id} at offset {offset}: {e}")
+                stopped = True
+                break
+
+            if r.status_code != 200:
+                print(f"Failed to fetch events for tag {tag_id} at offset {offset}: {r.status_code} - {r.text}")
+                stopped = True
+                break
+
+            response = loads(r.content)
+
+            if not response:
+                break
+
+            page_id = f"{tag_id}:{offset}"
+            if not checkpoint.is_written(page_id):
+                # An event can carry several political tags; only process it once per sweep
+                response = [event for event in response if event["id"] not in seen_event_ids]
+                seen_event_ids.update(event["id"] for event in response)
+
+                # Start a thread to process this entire response
+                page = ([], [], [])
+                thread = threading.Thread(target=process_response, args=(response, *page, lock))
+                thread.start()
+                pending.append((page_id, {"tag_id": tag_id, "offset": offset + PAGE_SIZE}, thread, page))
+
+                if len(pending) >= MAX_PENDING_PAGES and not write_oldest_page():
+                    failed = True
+                    break
+
+            offset += PAGE_SIZE
+
+        if stopped or failed:
+            break
+
+    # Write the remaining pages in order
+    while pending and not failed:
+        if not write_oldest_page():
+            failed = True
+
+    for _, _, thread, _ in pending:
+        thread.join()
+
+    if not writer.close():
+        failed = True
     connection.close()
-    print(f"Inserted {len(political_events)} bet descriptions, {len(bet_choices)} bet choices, and {len(prices)} prices successfully.")
+
+    if not stopped and not failed:
+        checkpoint.clear()
+        print(f"Inserted {totals['events']} bet descriptions, {totals['choices']} bet choices, and {totals['prices']} prices successfully.")
+    else:
+        print(f"Polymarket sweep stopped early at {checkpoint.position}; the next run will resume. "
+              f"Wrote {totals['events']} bet descriptions, {totals['choices']} bet choices, and {totals['prices']} prices.")
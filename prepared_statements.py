@@ -0,0 +1,47 @@
+from storage import Error
+
+# Server-side prepared statements for the hot lookups.
+# The price lookup, the existence checks and the pair name lookup run once per market
+# or pair, thousands of times per run. Sent as text they are parsed by the server on
+# every call; here each connection keeps one prepared cursor per statement, so a
+# statement is parsed once per connection and later calls only send the parameters.
+# The cache lives on the connection object and goes away with it.
+
+def prepared_cursor(connection, query):
+    """
+    Return the cached prepared cursor for query on this connection, creating it on first use.
+    """
+    cursors = getattr(connection, "_prepared_cursors", None)
+    if cursors is None:
+        cursors = {}
+        connection._prepared_cursors = cursors
+    cursor = cursors.get(query)
+    if cursor is None:
+        cursor = connection.cursor(prepared=True)
+        cursors[query] = cursor
+    return cursor
+
+def fetch_all(connection, query, params=()):
+    """
+    Execute a cached prepared statement and return every row. Results are always read
+    in full, since a prepared cursor can't be reused with rows left unread.
+    """
+    cursor = prepared_cursor(connection, query)
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    except Error:
+        # Don't keep a cursor that may be left mid-result; the next call prepares afresh
+        connection._prepared_cursors.pop(query, None)
+        try:
+            cursor.close()
+        except Error:
+            pass
+        raise
+
+def fetch_one(connection, query, params=()):
+    """
+    Execute a cached prepared statement and return its first row, or None.
+    """
+    rows = fetch_all(connection, query, params)
+    return rows[0] if rows else None
@@ -0,0 +1,254 @@
+from datetime import datetime, timedelta
+from storage import Error
+from prepared_statements import fetch_one
+
+# Price history retention.
+# Raw quotes in `price` are kept for RAW_RETENTION. Older quotes are rolled up into
+# 1-minute OHLC bars in price_1m and deleted; 1-minute bars older than MINUTE_RETENTION
+# are rolled up into 1-hour bars in price_1h and deleted; hourly bars are kept for
+# HOUR_RETENTION. A market can go longer than RAW_RETENTION without a new quote (cold
+# tier, or no longer returned by the sweep), so the latest-price lookups fall back to
+# the newest bar when an option has no raw row left (see latest_bar).
+#
+# Each level is processed in windows of whole buckets, starting from the oldest source
+# row still older than the cutoff. A window's bars are written and its source rows
+# deleted in one transaction, so a run can stop at any point and the next one carries
+# on without double counting. Rows that land behind already rolled windows (CSV
+# backfills, late write-behind flushes) are picked up the same way and merged into
+# the existing bars: each bar keeps the times of its first and last source rows, so
+# a late row only replaces the open (or close and volume) if it is older (or newer)
+# than what the bar already holds.
+#
+#   python price_retention.py   run one retention pass
+
+RAW_RETENTION = timedelta(days=2)
+MINUTE_RETENTION = timedelta(days=30)
+HOUR_RETENTION = timedelta(days=365)
+
+# Source time covered by one transaction, and the most windows handled per level per run
+RAW_WINDOW = timedelta(minutes=15)
+MINUTE_WINDOW = timedelta(hours=6)
+MAX_WINDOWS_PER_RUN = 96
+
+# Rows deleted per statement when expiring hourly bars
+DELETE_CHUNK_SIZE = 5000
+
+BAR_COLUMNS = """
+    option_id INT NOT NULL,
+    bucket DATETIME NOT NULL,
+    open_yes DECIMAL(10, 2),
+    high_yes DECIMAL(10, 2),
+    low_yes DECIMAL(10, 2),
+    close_yes DECIMAL(10, 2),
+    close_no DECIMAL(10, 2),
+    volume DECIMAL(18, 5),
+    samples INT NOT NULL,
+    first_at DATETIME,
+    last_at DATETIME,
+    PRIMARY KEY (option_id, bucket),
+    INDEX (bucket)
+"""
+
+# Bar tables, newest resolution first
+BAR_TABLES = ("price_1m", "price_1h")
+
+def create_bar_tables(cursor):
+    for table in BAR_TABLES:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({BAR_COLUMNS})")
+
+def create_retention_tables(connection):
+    try:
+        with connection.cursor() as cursor:
+            create_bar_tables(cursor)
+            connection.commit()
+    except Error as e:
+        print(f"Error creating price retention tables: {e}")
+
+def latest_bar(connection, option_id):
+    """
+    (close_yes, close_no, volume) of the newest bar for option_id, or None. Used once
+    an option's raw quotes have all been rolled up.
+    """
+    for table in BAR_TABLES:
+        row = fetch_one(connection, f"""
+            SELECT close_yes, close_no, volume FROM {table}
+            WHERE option_id = %s ORDER BY bucket DESC LIMIT 1
+        """, (option_id,))
+        if row:
+            return row
+    return None
+
+def floor_minute(value):
+    return value.replace(second=0, microsecond=0)
+
+def floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+# level -> (source query, source table, source time column, target table, bucket function, window)
+# Every source query returns rows of
+# (option_id, timestamp, open_yes, high_yes, low_yes, close_yes, close_no, volume, samples,
+#  first_at, last_at) ordered by option_id, timestamp.
+LEVELS = {
+    "1m": ("""
+        SELECT option_id, timestamp, yes_price, yes_price, yes_price, yes_price, no_price, volume, 1,
+               timestamp, timestamp
+        FROM price
+        WHERE timestamp >= %s AND timestamp < %s
+        ORDER BY option_id, timestamp
+    """, "price", "timestamp", "price_1m", floor_minute, RAW_WINDOW),
+    "1h": ("""
+        SELECT option_id, bucket, open_yes, high_yes, low_yes, close_yes, close_no, volume, samples,
+               COALESCE(first_at, bucket), COALESCE(last_at, bucket)
+        FROM price_1m
+        WHERE bucket >= %s AND bucket < %s
+        ORDER BY option_id, bucket
+    """, "price_1m", "bucket", "price_1h", floor_hour, MINUTE_WINDOW),
+}
+
+def aggregate_bars(rows, bucket_of):
+    """
+    Fold source rows, ordered by option_id and time, into one OHLC bar per
+    (option_id, bucket). Volume is the last value seen, since venues report
+    cumulative volume.
+    """
+    bars = {}
+    for option_id, ts, open_yes, high_yes, low_yes, close_yes, close_no, volume, samples, first_at, last_at in rows:
+        key = (option_id, bucket_of(ts))
+        bar = bars.get(key)
+        if bar is None:
+            bars[key] = [open_yes, high_yes, low_yes, close_yes, close_no, volume, samples, first_at, last_at]
+            continue
+        if high_yes is not None and (bar[1] is None or high_yes > bar[1]):
+            bar[1] = high_yes
+        if low_yes is not None and (bar[2] is None or low_yes < bar[2]):
+            bar[2] = low_yes
+        bar[3] = close_yes
+        bar[4] = close_no
+        bar[5] = volume
+        bar[6] += samples
+        bar[8] = last_at
+    return [key + tuple(bar) for key, bar in bars.items()]
+
+def oldest_before(cursor, source_table, time_column, cutoff):
+    """
+    Time of the oldest source row older than cutoff, or None. Rolled up rows are
+    deleted, so this is where the remaining work starts.
+    """
+    cursor.execute(
+        f"SELECT {time_column} FROM {source_table} WHERE {time_column} < %s ORDER BY {time_column} LIMIT 1",
+        (cutoff,)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def roll_up_level(connection, level, retention, now=None, max_windows=MAX_WINDOWS_PER_RUN):
+    """
+    Roll up and delete the source rows of `level` older than `retention`, one window per
+    transaction, for at most max_windows windows. Returns the number of source rows rolled up.
+    """
+    select_query, source_table, time_column, target_table, bucket_of, window = LEVELS[level]
+    # A conflict means late rows for a bar that was already rolled. Open, close and
+    # volume only move if the late rows are older or newer than the bar's own (bars
+    # from before first_at/last_at existed keep theirs). first_at and last_at are
+    # assigned last, since MySQL evaluates these assignments left to right.
+    upsert_query = f"""
+    INSERT INTO {target_table} (
+        option_id, bucket, open_yes, high_yes, low_yes, close_yes, close_no, volume, samples,
+        first_at, last_at
+    )
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        open_yes = CASE WHEN VALUES(first_at) < first_at THEN VALUES(open_yes) ELSE open_yes END,
+        high_yes = COALESCE(GREATEST(high_yes, VALUES(high_yes)), high_yes, VALUES(high_yes)),
+        low_yes = COALESCE(LEAST(low_yes, VALUES(low_yes)), low_yes, VALUES(low_yes)),
+        close_yes = CASE WHEN VALUES(last_at) > last_at THEN VALUES(close_yes) ELSE close_yes END,
+        close_no = CASE WHEN VALUES(last_at) > last_at THEN VALUES(close_no) ELSE close_no END,
+        volume = CASE WHEN VALUES(last_at) > last_at THEN VALUES(volume) ELSE volume END,
+        samples = samples + VALUES(samples),
+        first_at = CASE WHEN VALUES(first_at) < first_at THEN VALUES(first_at) ELSE first_at END,
+        last_at = CASE WHEN VALUES(last_at) > last_at THEN VALUES(last_at) ELSE last_at END
+    """
+    cutoff = bucket_of((now or datetime.now()) - retention)
+    rolled = 0
+
+    try:
+        with connection.cursor() as cursor:
+            for _ in range(max_windows):
+                oldest = oldest_before(cursor, source_table, time_column, cutoff)
+                if oldest is None:
+                    break
+                window_start = bucket_of(oldest)
+                window_end = min(window_start + window, cutoff)
+
+                cursor.execute(select_query, (window_start, window_end))
+                rows = cursor.fetchall()
+                bars = aggregate_bars(rows, bucket_of)
+                if bars:
+                    cursor.executemany(upsert_query, bars)
+                cursor.execute(
+                    f"DELETE FROM {source_table} WHERE {time_column} >= %s AND {time_column} < %s",
+                    (window_start, window_end)
+                )
+                connection.commit()
+
+                rolled += len(rows)
+    except Error as e:
+        connection.rollback()
+        print(f"Error rolling up {level} price bars: {e}")
+
+    if rolled:
+        print(f"Rolled {rolled} rows from {source_table} into {target_table}.")
+    return rolled
+
+def expire_hourly_bars(connection, retention=HOUR_RETENTION, now=None, chunk_size=DELETE_CHUNK_SIZE):
+    """
+    Delete hourly bars older than `retention`, chunk_size rows per statement.
+    Returns the number of rows deleted.
+    """
+    cutoff = (now or datetime.now()) - retention
+    deleted = 0
+    try:
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute("DELETE FROM price_1h WHERE bucket < %s LIMIT %s", (cutoff, chunk_size))
+                connection.commit()
+                deleted += cursor.rowcount
+                if cursor.rowcount < chunk_size:
+                    break
+    except Error as e:
+        connection.rollback()
+        print(f"Error expiring hourly price bars: {e}")
+
+    if deleted:
+        print(f"Deleted {deleted} hourly price bars older than {cutoff:%Y-%m-%d}.")
+    return deleted
+
+def apply_price_retention(
+    connection,
+    raw_retention=RAW_RETENTION,
+    minute_retention=MINUTE_RETENTION,
+    hour_retention=HOUR_RETENTION,
+    now=None
+):
+    """
+    Run one retention pass: raw -> 1m, 1m -> 1h, then expire old hourly bars.
+    """
+    create_retention_tables(connection)
+    roll_up_level(connection, "1m", raw_retention, now)
+    roll_up_level(connection, "1h", minute_retention, now)
+    expire_hourly_bars(connection, hour_retention, now)
+
+def run_price_retention():
+    import main
+
+    connection = main.create_connection()
+    if connection is None:
+        print("Failed to connect to the database.")
+        return
+    try:
+        apply_price_retention(connection)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    run_price_retention()
@@ -0,0 +1,178 @@
+import queue
+import threading
+import time
+from storage import Error
+from bulk_load import upsert_rows
+
+# Write-behind writer for quotes.
+# Fetchers hand batches of price rows to submit() and carry on; a background thread
+# coalesces them into one transaction per FLUSH_ROWS rows or FLUSH_INTERVAL seconds,
+# whichever comes first. The queue is bounded, so when the database falls behind,
+# submit() blocks and fetching slows to the rate writes are committed.
+
+FLUSH_ROWS = 5000
+FLUSH_INTERVAL = 2.0
+MAX_PENDING_BATCHES = 64
+
+# Seconds close() waits for the writer to drain before giving up on it
+CLOSE_TIMEOUT = 60.0
+
+PRICE_COLUMNS = ("option_id", "timestamp", "volume", "yes_price", "no_price", "yes_odds", "no_odds")
+PRICE_UPDATE_COLUMNS = ("volume", "yes_price", "no_price", "yes_odds", "no_odds")
+
+PRICE_QUERY = """
+INSERT INTO price (option_id, timestamp, volume, yes_price, no_price, yes_odds, no_odds)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    volume=VALUES(volume),
+    yes_price=VALUES(yes_price),
+    no_price=VALUES(no_price),
+    yes_odds=VALUES(yes_odds),
+    no_odds=VALUES(no_odds)
+"""
+
+_STOP = object()
+
+class PriceWriter:
+    """
+    Background price writer with its own database connection.
+    Batches are committed in the order they were submitted, and each batch's
+    on_written callback runs (on the writer thread) once it is committed, so sweeps can
+    checkpoint a page only after its quotes are stored. After a failed flush nothing
+    more is written or acknowledged; `failed` is set so producers can stop early.
+
+        with PriceWriter() as writer:
+            writer.submit(prices, on_written=lambda: checkpoint.save(page_id, next_position))
+    """
+    def __init__(self, flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING_BATCHES):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.failed = False
+        self.rows_written = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="price-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def _put(self, item, timeout=None):
+        """
+        Queue item, blocking while the queue is full. Gives up, setting `failed`, if the
+        writer thread has died or timeout seconds pass, so producers never hang on a
+        writer that stopped draining. Returns True if the item was queued.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                self._queue.put(item, timeout=1.0)
+                return True
+            except queue.Full:
+                pass
+            if self._thread is None or not self._thread.is_alive() or (
+                    deadline is not None and time.monotonic() >= deadline):
+                print("Price writer is not draining its queue; dropping quotes.")
+                self.failed = True
+                return False
+
+    def submit(self, prices, on_written=None):
+        """
+        Queue a batch of price rows (in PRICE_COLUMNS order). Blocks while the queue is full.
+        """
+        self._put((prices, on_written))
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """
+        Flush everything submitted so far and stop the writer, waiting at most about
+        timeout seconds. Returns True if every batch was committed.
+        """
+        if self._thread is not None:
+            started = time.monotonic()
+            if self._put(_STOP, timeout):
+                self._thread.join(max(timeout - (time.monotonic() - started), 0))
+            if self._thread.is_alive():
+                print(f"Price writer did not finish within {timeout:.0f}s; abandoning unwritten quotes.")
+                self.failed = True
+            self._thread = None
+        return not self.failed
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        try:
+            import main
+            connection = main.create_connection()
+        except Exception as e:
+            print(f"Price writer could not start: {e}")
+            connection = None
+        if connection is None:
+            print("Price writer failed to connect to the database; dropping quotes.")
+            self.failed = True
+
+        rows = []
+        callbacks = []
+        deadline = None
+        stopping = False
+
+        while not stopping:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            # Anything unexpected marks the writer failed but never ends the loop, so
+            # the queue keeps draining and producers can't block on it forever
+            try:
+                if item is _STOP:
+                    stopping = True
+                elif item is not None:
+                    prices, on_written = item
+                    rows.extend(prices)
+                    if on_written is not None:
+                        callbacks.append(on_written)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    if len(rows) < self.flush_rows and time.monotonic() < deadline:
+                        continue
+
+                if (rows or callbacks) and not self.failed:
+                    self._flush(connection, rows, callbacks)
+            except Exception as e:
+                print(f"Price writer error: {e}")
+                self.failed = True
+            rows = []
+            callbacks = []
+            deadline = None
+
+        if connection is not None:
+            connection.close()
+
+    def _flush(self, connection, rows, callbacks):
+        try:
+            with connection.cursor() as cursor:
+                upsert_rows(cursor, PRICE_QUERY, "price", PRICE_COLUMNS, rows, PRICE_UPDATE_COLUMNS)
+            connection.commit()
+        except Exception as e:
+            # Not only database errors: staging the bulk load file can raise OSError,
+            # and a malformed row a TypeError
+            print(f"Error writing {len(rows)} prices: {e}")
+            self.failed = True
+            try:
+                connection.rollback()
+            except Error:
+                pass
+            return
+
+        self.rows_written += len(rows)
+        try:
+            for on_written in callbacks:
+                on_written()
+        except Exception as e:
+            print(f"Error acknowledging written prices: {e}")
+            self.failed = True
@@ -1,32 +1,10 @@
-import mysql.connector
-from mysql.connector import Error
-from dotenv import load_dotenv
-import os
-
-# Load environment variables from .env file
-load_dotenv()
-def create_connection():
-    """
-    Establish and return a connection to the MySQL database.
-    """
-    try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASS'),
-            database=os.getenv('DB_NAME')
-        )
-        print("Successfully connected to the database")
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        return None
+from storage import Error, create_connection
 
 def get_option_ids_by_bet_id(connection, bet_id):
     """
     Query all options for a specific bet_id from the bet_choice table.
     Args:
-        connection: MySQL connection object
+        connection: Database connection (see storage.create_connection)
         bet_id (int): The ID of the bet for which options are to be fetched.
     Returns:
         List of dictionaries containing option_id and name for the given bet_id.
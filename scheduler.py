@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+
+# A job is a zero-argument callable that is run every `interval` seconds.
+# Each run is pushed back or forward by up to `jitter` (a fraction of the interval)
+# so jobs that share an interval don't all hit the venues and the database at once.
+class Job:
+    def __init__(self, name, func, interval, jitter=0.1):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.next_run = time.monotonic()
+        self._lock = threading.Lock()
+
+        # Timing stats
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_time = None
+
+    def schedule_next(self):
+        spread = self.interval * self.jitter
+        self.next_run = time.monotonic() + self.interval + random.uniform(-spread, spread)
+
+    def is_running(self):
+        return self._lock.locked()
+
+    def run(self):
+        """
+        Run the job once. If the previous run is still going, the new run is skipped
+        instead of overlapping with it.
+        """
+        if not self._lock.acquire(blocking=False):
+            self.skipped += 1
+            print(f"[scheduler] {self.name} is still running, skipping this run.")
+            return
+
+        start = time.perf_counter()
+        try:
+            self.func()
+        except Exception as e:
+            self.failures += 1
+            print(f"[scheduler] {self.name} failed: {e}")
+        finally:
+            elapsed = time.perf_counter() - start
+            self.runs += 1
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+            self.last_time = elapsed
+            self._lock.release()
+            print(f"[scheduler] {self.name} finished in {elapsed:.2f}s")
+
+    def stats(self):
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "avg_time": self.total_time / self.runs if self.runs else 0.0,
+            "max_time": self.max_time,
+            "last_time": self.last_time,
+        }
+
+class Scheduler:
+    def __init__(self, jobs, stats_interval=300):
+        self.jobs = list(jobs)
+        self.stats_interval = stats_interval
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def print_stats(self):
+        print("\n[scheduler] Job stats:")
+        for job in self.jobs:
+            s = job.stats()
+            last = f"{s['last_time']:.2f}s" if s["last_time"] is not None else "n/a"
+            print(f"  {job.name}: runs={s['runs']} failures={s['failures']} skipped={s['skipped']} "
+                  f"avg={s['avg_time']:.2f}s max={s['max_time']:.2f}s last={last}")
+
+    def run_forever(self):
+        """
+        Run every job on its own interval until stop() is called (or Ctrl+C).
+        Each run happens on its own thread so a slow job doesn't delay the others.
+        """
+        next_stats = time.monotonic() + self.stats_interval
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                for job in self.jobs:
+                    if job.next_run <= now:
+                        job.schedule_next()
+                        threading.Thread(target=job.run, name=job.name, daemon=True).start()
+
+                if now >= next_stats:
+                    self.print_stats()
+                    next_stats = now + self.stats_interval
+
+                wake_at = min(job.next_run for job in self.jobs)
+                self._stop.wait(max(0.1, min(wake_at - time.monotonic(), 1.0)))
+        except KeyboardInterrupt:
+            print("\n[scheduler] Stopping...")
+        finally:
+            self.print_stats()
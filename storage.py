@@ -0,0 +1,448 @@
+import atexit
+import os
+import re
+import sqlite3
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from dotenv import load_dotenv
+
+# Storage backends.
+# Every module gets its database connection from create_connection() here, and catches
+# storage.Error. Two backends are available, picked with DB_BACKEND:
+#
+#   mysql   (default) the MySQL server configured by DB_HOST, DB_USER, DB_PASS, DB_NAME
+#   sqlite  an embedded SQLite file at DB_PATH (default polibets.db); DB_PATH=:memory:
+#           uses a throwaway file that is removed when the process exits
+#
+# The SQLite backend is for development, tests, benchmarks and offline analysis. Its
+# connections behave like mysql-connector's for what this project uses: cursors as
+# context managers, %s placeholders, dictionary and prepared cursors, rowcount and
+# lastrowid. Queries are translated from the MySQL dialect (upserts, INSERT IGNORE,
+# CURDATE(), ...); statements with no SQLite equivalent, such as UPDATE ... JOIN or
+# LOAD DATA, raise Error. Its schema is created at the latest migration on connect.
+
+load_dotenv()
+
+BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+DB_PATH = os.getenv("DB_PATH", "polibets.db")
+
+try:
+    import mysql.connector
+    from mysql.connector import Error
+except ImportError:
+    # Only the embedded backend can be used without mysql-connector
+    mysql = None
+
+    class Error(Exception):
+        def __init__(self, msg=None, errno=None, values=None, sqlstate=None):
+            super().__init__(msg)
+            self.msg = msg
+            self.errno = errno
+            self.sqlstate = sqlstate
+
+def create_connection(allow_local_infile=False):
+    """
+    Open a connection to the configured backend. Returns None if it can't be opened.
+    """
+    if BACKEND == "sqlite":
+        return connect_sqlite()
+
+    connection = None
+    try:
+        print(f"Attempting to connect to:")
+        print(f"Host: {os.getenv('DB_HOST')}")
+        print(f"User: {os.getenv('DB_USER')}")
+        print(f"Database: {os.getenv('DB_NAME')}")
+
+        connection = mysql.connector.connect(
+            host=os.getenv('DB_HOST'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASS'),
+            database=os.getenv('DB_NAME'),
+            allow_local_infile=allow_local_infile
+        )
+        print("Successfully connected to the database")
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        print(f"Error Code: {e.errno}")
+        print(f"SQL State: {e.sqlstate}")
+        print(f"Error Message: {e.msg}")
+    return connection
+
+def is_embedded(connection):
+    return isinstance(connection, SQLiteConnection)
+
+def database_url():
+    """
+    SQLAlchemy URL of the configured backend. For the embedded backend the schema is
+    created first, so the API sees the same tables as the pipeline.
+    """
+    if BACKEND == "sqlite":
+        connect_sqlite().close()
+        return f"sqlite:///{resolve_sqlite_path()}"
+    return f"mysql+mysqlconnector://{os.getenv('DB_USER')}:{os.getenv('DB_PASS')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
+
+def engine_options():
+    """
+    Extra create_engine() arguments for the configured backend.
+    """
+    if BACKEND == "sqlite":
+        # FastAPI serves requests from a thread pool
+        return {"connect_args": {"check_same_thread": False}}
+    return {}
+
+""" *** embedded SQLite backend *** """
+
+# Schema of the MySQL database after every migration in migrations.py, in SQLite terms
+SQLITE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS bet_description (
+        bet_id INTEGER PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        expiration_date DATE,
+        website VARCHAR(255),
+        bet_url VARCHAR(255),
+        status VARCHAR(10),
+        is_arbitrage VARCHAR(10)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bet_choice (
+        option_id INTEGER PRIMARY KEY,
+        bet_id INT REFERENCES bet_description(bet_id),
+        name VARCHAR(255) NOT NULL,
+        outcome VARCHAR(10) NOT NULL,
+        ticker VARCHAR(100)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS price (
+        option_id INT REFERENCES bet_choice(option_id),
+        timestamp DATETIME,
+        volume DECIMAL(18, 5),
+        yes_price DECIMAL(10, 2),
+        no_price DECIMAL(10, 2),
+        yes_odds DECIMAL(10, 2),
+        no_odds DECIMAL(10, 2),
+        PRIMARY KEY (option_id, timestamp)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS arbitrage_opportunities (
+        arb_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        bet_id1 INT NOT NULL,
+        bet_id2 INT NOT NULL,
+        timestamp DATETIME,
+        profit DECIMAL(10, 2),
+        option_id_1 INT,
+        option_id_2 INT,
+        option_name_1 VARCHAR(255),
+        option_name_2 VARCHAR(255),
+        bet_description_1 VARCHAR(255),
+        bet_description_2 VARCHAR(255),
+        website_1 VARCHAR(255),
+        website_2 VARCHAR(255),
+        bet_side_1 VARCHAR(10),
+        bet_side_2 VARCHAR(10),
+        price_yes_1 DECIMAL(10, 2),
+        price_no_2 DECIMAL(10, 2),
+        bet_amount_1 DECIMAL(10, 2),
+        bet_amount_2 DECIMAL(10, 2)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS arbitrage_bet_sides (
+        arb_id INTEGER PRIMARY KEY REFERENCES arbitrage_opportunities(arb_id),
+        bet_side_1 VARCHAR(10) NOT NULL,
+        bet_side_2 VARCHAR(10) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS arbitrage_opportunities_archive (
+        arb_id INTEGER PRIMARY KEY,
+        bet_id1 INT NOT NULL,
+        bet_id2 INT NOT NULL,
+        timestamp DATETIME,
+        profit DECIMAL(10, 2),
+        option_id_1 INT,
+        option_id_2 INT,
+        option_name_1 VARCHAR(255),
+        option_name_2 VARCHAR(255),
+        bet_description_1 VARCHAR(255),
+        bet_description_2 VARCHAR(255),
+        website_1 VARCHAR(255),
+        website_2 VARCHAR(255),
+        bet_side_1 VARCHAR(10),
+        bet_side_2 VARCHAR(10),
+        price_yes_1 DECIMAL(10, 2),
+        price_no_2 DECIMAL(10, 2),
+        bet_amount_1 DECIMAL(10, 2),
+        bet_amount_2 DECIMAL(10, 2)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS arbitrage_bet_sides_archive (
+        arb_id INTEGER PRIMARY KEY,
+        bet_side_1 VARCHAR(10) NOT NULL,
+        bet_side_2 VARCHAR(10) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS similar_events (
+        event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        bet_id_1 INT NOT NULL REFERENCES bet_description(bet_id),
+        description_1 TEXT NOT NULL,
+        website_1 VARCHAR(255) NOT NULL,
+        bet_id_2 INT NOT NULL REFERENCES bet_description(bet_id),
+        description_2 TEXT NOT NULL,
+        website_2 VARCHAR(255) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS similar_event_options (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        event_id INT NOT NULL REFERENCES similar_events(event_id),
+        option_id_1 INT NOT NULL REFERENCES bet_choice(option_id),
+        option_id_2 INT NOT NULL REFERENCES bet_choice(option_id),
+        option_name_1 VARCHAR(255),
+        option_name_2 VARCHAR(255)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS price_1m (
+        option_id INT NOT NULL,
+        bucket DATETIME NOT NULL,
+        open_yes DECIMAL(10, 2),
+        high_yes DECIMAL(10, 2),
+        low_yes DECIMAL(10, 2),
+        close_yes DECIMAL(10, 2),
+        close_no DECIMAL(10, 2),
+        volume DECIMAL(18, 5),
+        samples INT NOT NULL,
+        first_at DATETIME,
+        last_at DATETIME,
+        PRIMARY KEY (option_id, bucket)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS price_1h (
+        option_id INT NOT NULL,
+        bucket DATETIME NOT NULL,
+        open_yes DECIMAL(10, 2),
+        high_yes DECIMAL(10, 2),
+        low_yes DECIMAL(10, 2),
+        close_yes DECIMAL(10, 2),
+        close_no DECIMAL(10, 2),
+        volume DECIMAL(18, 5),
+        samples INT NOT NULL,
+        first_at DATETIME,
+        last_at DATETIME,
+        PRIMARY KEY (option_id, bucket)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_price_1m_bucket ON price_1m (bucket)",
+    "CREATE INDEX IF NOT EXISTS idx_price_1h_bucket ON price_1h (bucket)",
+    "CREATE INDEX IF NOT EXISTS idx_seo_options ON similar_event_options (option_id_1, option_id_2)",
+    # Databases created before the unique key may hold duplicate pairs
+    """
+    DELETE FROM similar_event_options WHERE id NOT IN (
+        SELECT MIN(id) FROM similar_event_options GROUP BY event_id, option_id_1, option_id_2
+    )
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_seo_event_options
+    ON similar_event_options (event_id, option_id_1, option_id_2)
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_bd_name_expiration ON bet_description (name, expiration_date)",
+    "CREATE INDEX IF NOT EXISTS idx_bd_status_expiration ON bet_description (status, expiration_date)",
+    "CREATE INDEX IF NOT EXISTS idx_bc_bet_name ON bet_choice (bet_id, name)",
+    "CREATE INDEX IF NOT EXISTS idx_bc_ticker ON bet_choice (ticker)",
+    "CREATE INDEX IF NOT EXISTS idx_ao_timestamp ON arbitrage_opportunities (timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_ao_options ON arbitrage_opportunities (option_id_1, option_id_2)",
+    "CREATE INDEX IF NOT EXISTS idx_price_timestamp ON price (timestamp)",
+]
+
+# (pattern, replacement) rewrites from the MySQL dialect, applied in order
+_TRANSLATIONS = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.I), "INSERT OR IGNORE"),
+    (re.compile(r"\bCURDATE\(\)", re.I), "date('now', 'localtime')"),
+    (re.compile(r"\bNOW\(\)", re.I), "datetime('now', 'localtime')"),
+    (re.compile(r"\bGREATEST\(", re.I), "MAX("),
+    (re.compile(r"\bLEAST\(", re.I), "MIN("),
+    (re.compile(r"\bENUM\([^)]*\)", re.I), "VARCHAR(10)"),
+    (re.compile(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.I), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r",\s*INDEX\s*\([^)]*\)", re.I), ""),
+    (re.compile(r"\bCREATE\s+TABLE\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+LIKE\s+(\w+)", re.I),
+     r"CREATE TABLE IF NOT EXISTS \1 AS SELECT * FROM \2 WHERE 0"),
+    (re.compile(r"\bDELETE\s+FROM\s+(\w+)\s+WHERE\s+(.*?)\s+LIMIT\s+\?", re.I | re.S),
+     r"DELETE FROM \1 WHERE rowid IN (SELECT rowid FROM \1 WHERE \2 LIMIT ?)"),
+]
+_UPSERT = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b(.*)$", re.I | re.S)
+_VALUES_REF = re.compile(r"\bVALUES\((\w+)\)", re.I)
+
+_translated = {}
+
+def translate_query(query):
+    """
+    Rewrite a MySQL statement for SQLite. Results are cached per statement text.
+    """
+    result = _translated.get(query)
+    if result is not None:
+        return result
+
+    result = query
+    for pattern, replacement in _TRANSLATIONS:
+        result = pattern.sub(replacement, result)
+    upsert = _UPSERT.search(result)
+    if upsert:
+        assignments = _VALUES_REF.sub(r"excluded.\1", upsert.group(1))
+        result = result[:upsert.start()] + "ON CONFLICT DO UPDATE SET" + assignments
+
+    _translated[query] = result
+    return result
+
+def _parse_date(value):
+    return date.fromisoformat(value.decode()[:10])
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value.decode())
+
+def _parse_decimal(value):
+    return Decimal(value.decode())
+
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter("DATE", _parse_date)
+sqlite3.register_converter("DATETIME", _parse_datetime)
+sqlite3.register_converter("DECIMAL", _parse_decimal)
+
+class SQLiteCursor:
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, params=()):
+        try:
+            self._cursor.execute(translate_query(query), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise Error(msg=str(e)) from e
+
+    def executemany(self, query, rows):
+        try:
+            self._cursor.executemany(translate_query(query), [tuple(row) for row in rows])
+        except sqlite3.Error as e:
+            raise Error(msg=str(e)) from e
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+class SQLiteConnection:
+    """
+    A SQLite connection with the subset of mysql-connector's connection API used here.
+    sqlite3 caches compiled statements per connection, so prepared cursors are plain cursors.
+    """
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, timeout=30, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+
+    def cursor(self, dictionary=False, prepared=False, buffered=None):
+        return SQLiteCursor(self._connection.cursor(), dictionary=dictionary)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+
+    def is_connected(self):
+        try:
+            self._connection.execute("SELECT 1")
+            return True
+        except sqlite3.ProgrammingError:
+            return False
+
+_sqlite_path = None
+_schema_ready = False
+
+def resolve_sqlite_path():
+    global _sqlite_path
+    if _sqlite_path is None:
+        if DB_PATH == ":memory:":
+            # Each pipeline step opens its own connection, so an in-memory database would
+            # vanish between steps; use a temporary file that lives as long as the process
+            handle, _sqlite_path = tempfile.mkstemp(prefix="polibets-", suffix=".db")
+            os.close(handle)
+            atexit.register(os.remove, _sqlite_path)
+        else:
+            _sqlite_path = DB_PATH
+    return _sqlite_path
+
+# Columns added to SQLITE_SCHEMA tables after they shipped: CREATE TABLE IF NOT EXISTS
+# leaves an existing database file as it was, so these are added when missing
+SQLITE_ADDED_COLUMNS = [
+    ("price_1m", "first_at", "DATETIME"),
+    ("price_1m", "last_at", "DATETIME"),
+    ("price_1h", "first_at", "DATETIME"),
+    ("price_1h", "last_at", "DATETIME"),
+]
+
+def create_sqlite_schema(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode = WAL")
+        for statement in SQLITE_SCHEMA:
+            cursor.execute(statement)
+        for table, column, column_type in SQLITE_ADDED_COLUMNS:
+            cursor.execute(f"PRAGMA table_info({table})")
+            if column not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    connection.commit()
+
+def connect_sqlite():
+    global _schema_ready
+    try:
+        connection = SQLiteConnection(resolve_sqlite_path())
+        if not _schema_ready:
+            create_sqlite_schema(connection)
+            _schema_ready = True
+        return connection
+    except (sqlite3.Error, Error) as e:
+        print(f"Error opening SQLite database {resolve_sqlite_path()}: {e}")
+        return None
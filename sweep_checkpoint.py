@@ -0,0 +1,75 @@
+import json
+import os
+import time
+
+# Checkpoints for paginated venue sweeps, one JSON file per sweep.
+# A sweep saves its next cursor/offset after each page is written to the database,
+# so a run that crashes or times out can pick up where it stopped next time.
+CHECKPOINT_DIR = "sweep_checkpoints"
+
+# A checkpoint older than this is ignored: the catalog has moved on, start over
+MAX_AGE = 6 * 3600
+
+class SweepCheckpoint:
+    def __init__(self, name, directory=CHECKPOINT_DIR, max_age=MAX_AGE):
+        self.name = name
+        self.path = os.path.join(directory, f"{name}.json")
+        self.max_age = max_age
+        self.position = None
+        self.written_pages = set()
+
+    def load(self):
+        """
+        Load a previous unfinished sweep, if there is a recent one.
+        Returns the position (cursor/offset) to resume from, or None to start over.
+        """
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+
+        if time.time() - state.get("updated_at", 0) > self.max_age:
+            print(f"Checkpoint for {self.name} sweep is stale, starting over.")
+            self.clear()
+            return None
+
+        self.position = state.get("position")
+        self.written_pages = set(state.get("written_pages", []))
+        print(f"Resuming {self.name} sweep from {self.position} ({len(self.written_pages)} pages already written).")
+        return self.position
+
+    def is_written(self, page_id):
+        return str(page_id) in self.written_pages
+
+    def save(self, page_id, next_position):
+        """
+        Record that page_id has been written and the sweep should continue at next_position.
+        """
+        self.written_pages.add(str(page_id))
+        self.position = next_position
+        state = {
+            "position": next_position,
+            "written_pages": sorted(self.written_pages),
+            "updated_at": time.time(),
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Write to a temp file and rename so a crash mid-write can't corrupt the checkpoint
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """
+        Forget the checkpoint once the sweep has finished.
+        """
+        self.position = None
+        self.written_pages = set()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -1,21 +1,142 @@
-import requests
-import ast
-import main
-from datetime import datetime
-from mysql.connector import Error
-from polymarketapi import getpolymarketinfo
-from close_expired_events import close_past_events
-from kalshiapi import get_kalshi_info
-from arbitrage_calculator import update_arbitrage
+import sys
 
-def update():
-    #update polymarket info
-    #getpolymarketinfo()
-    #update kalshi info here
-    #get_kalshi_info()
-    #goes through the database and if the expiration date is past, change to close
-    #close_past_events()
-    #calculate arbitrage opportunities
+# Each step is imported inside the function that runs it so that running this
+# script only loads the ingesters it actually calls (and never the FastAPI app).
+
+def update_polymarket():
+    from polymarketapi import getpolymarketinfo
+    getpolymarketinfo()
+
+def update_kalshi():
+    from kalshiapi import get_kalshi_info
+    get_kalshi_info()
+
+def close_expired():
+    from close_expired_events import close_past_events
+    from arbitrage_calculator import active_pairs
+    active_pairs.prune(close_past_events())
+
+def apply_migrations():
+    # The matcher relies on the unique key on similar_event_options (migration 6) to
+    # skip pairs it already stored, so it only runs once the schema is up to date
+    import main
+    from migrations import run_migrations
+    connection = main.create_connection()
+    if connection is None:
+        raise RuntimeError("failed to connect to the database")
+    try:
+        if not run_migrations(connection):
+            raise RuntimeError("schema migrations failed")
+    finally:
+        connection.close()
+
+def match_options():
+    # The matcher bumps the pair catalog version, which makes arbitrage reload its pairs
+    from option_check import populate_similar_event_options
+    populate_similar_event_options()
+
+_tiered_poller = None
+
+def refresh_matched_markets():
+    global _tiered_poller
+    from market_tiers import TieredPoller
+    if _tiered_poller is None:
+        _tiered_poller = TieredPoller()
+    _tiered_poller.poll_due()
+
+def trim_http_cache():
+    import http_client
+    http_client.trim_all_caches()
+
+def apply_price_retention():
+    from price_retention import run_price_retention
+    run_price_retention()
+
+def archive_arbitrage():
+    from arbitrage_archive import run_arbitrage_archive
+    run_arbitrage_archive()
+
+def export_parquet():
+    from parquet_export import run_parquet_export
+    run_parquet_export()
+
+def calculate_arbitrage():
+    from arbitrage_calculator import update_arbitrage
     update_arbitrage()
 
-update()
\ No newline at end of file
+# Seconds between runs of each step when running continuously.
+# The full catalog sweeps run slowly; matched markets are refreshed by the
+# "matched_markets" job, which only polls options whose tier is due (see market_tiers).
+# Pairs are re-evaluated by the arbitrage worker as soon as their quotes move, so the
+# "arbitrage" job is only a backstop sweep over every pair.
+JOB_INTERVALS = {
+    "polymarket": 1800,
+    "kalshi": 1800,
+    "matched_markets": 5,
+    "close_expired": 3600,
+    "matcher": 1800,
+    "arbitrage": 600,
+    "http_cache": 3600,
+    "price_retention": 900,
+    "arbitrage_archive": 3600,
+    "parquet_export": 3600,
+}
+
+def update():
+    """
+    Run the whole update as a dependency graph:
+    - Pending migrations are applied first, before anything writes.
+    - Polymarket and Kalshi ingestion are independent and run in parallel.
+    - Closing expired events runs after both, since ingestion re-upserts events as 'open'.
+    - The matcher runs after both ingesters so it sees new options.
+    - Arbitrage runs last, once events are closed and options are matched.
+    """
+    from pipeline import Stage, run_pipeline
+
+    stages = [
+        Stage("migrations", apply_migrations),
+        Stage("polymarket", update_polymarket, depends_on=["migrations"]),
+        Stage("kalshi", update_kalshi, depends_on=["migrations"]),
+        Stage("close_expired", close_expired, depends_on=["polymarket", "kalshi"]),
+        Stage("matcher", match_options, depends_on=["polymarket", "kalshi"]),
+        Stage("arbitrage", calculate_arbitrage, depends_on=["close_expired", "matcher"]),
+    ]
+    return run_pipeline(stages)
+
+def run_scheduler():
+    """
+    Keep the data fresh by running every step on its own interval (see JOB_INTERVALS),
+    with the arbitrage worker evaluating pairs as their quotes update.
+    """
+    from scheduler import Job, Scheduler
+    from arbitrage_worker import ArbitrageWorker
+
+    jobs = [
+        Job("polymarket", update_polymarket, JOB_INTERVALS["polymarket"]),
+        Job("kalshi", update_kalshi, JOB_INTERVALS["kalshi"]),
+        Job("matched_markets", refresh_matched_markets, JOB_INTERVALS["matched_markets"], jitter=0),
+        Job("close_expired", close_expired, JOB_INTERVALS["close_expired"]),
+        Job("arbitrage", calculate_arbitrage, JOB_INTERVALS["arbitrage"]),
+        Job("http_cache", trim_http_cache, JOB_INTERVALS["http_cache"]),
+        Job("price_retention", apply_price_retention, JOB_INTERVALS["price_retention"]),
+        Job("arbitrage_archive", archive_arbitrage, JOB_INTERVALS["arbitrage_archive"]),
+        Job("parquet_export", export_parquet, JOB_INTERVALS["parquet_export"]),
+    ]
+    # See apply_migrations: without the unique key the matcher would duplicate pairs
+    try:
+        apply_migrations()
+        jobs.append(Job("matcher", match_options, JOB_INTERVALS["matcher"]))
+    except RuntimeError as e:
+        print(f"Not scheduling the matcher: {e}")
+
+    worker = ArbitrageWorker().start()
+    try:
+        Scheduler(jobs).run_forever()
+    finally:
+        worker.stop()
+
+if __name__ == "__main__":
+    if "--loop" in sys.argv:
+        run_scheduler()
+    else:
+        update()